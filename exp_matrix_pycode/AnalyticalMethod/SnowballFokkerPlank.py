@@ -14,6 +14,10 @@ under the BSM model.
 Version History:
 1.0.0 - 2023-11-8
     - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Add `_set_backward_matrix`, the pricing (Backward Kolmogorov) operator on the same grid and stencils.
+1.0.2 - 2026-10-18
+    - `analytical` accepts the initial spot (scalar, or an (m, 1) array for m stacked densities).
 """
 import numpy as np
 import scipy.sparse as sp
@@ -89,9 +93,35 @@ class SnowballDiscrete():
         self.u = [0] + list(self.drift*self.u1 + self.diffusion*self.u2) + [0]
         self.A = sp.diags([self.l[1:], self.c, self.u[:-1]], [-1, 0, 1], format='csc')
 
-    def analytical(self, time):
+    def _set_backward_matrix(self):
+        """ 定价 PDE（Backward Kolmogorov）：V_t + 0.5 vol^2 x^2 V_xx + r x V_x - r V = 0
+            以 dV/dtau = L V 的形式储存在 self.L 中（tau 为剩余期限），首尾两行只保留贴现项 """
+        self.dx = self._dx[:-1]
+        # 舍弃第一个元素
+        self.dx_shift = self._dx[1:]
+
+        # 一阶导数
+        self.l1 = - self.dx_shift / ((self.dx + self.dx_shift) * self.dx)
+        self.c1 = (self.dx_shift - self.dx) / (self.dx * self.dx_shift)
+        self.u1 = self.dx / ((self.dx + self.dx_shift) * self.dx_shift)
+
+        # 二阶导数
+        self.l2 = 2 / ((self.dx + self.dx_shift) * self.dx)
+        self.c2 = -2 / (self.dx * self.dx_shift)
+        self.u2 = 2 / ((self.dx + self.dx_shift) * self.dx_shift)
+
+        # 构建系数矩阵
+        self.drift = self.r * self.xvec[1:-1]
+        self.diffusion = 0.5 * (self.xvec[1:-1] * self.vol) ** 2
+        self.l = list(self.drift * self.l1 + self.diffusion * self.l2) + [0]
+        self.c = [-self.r] + list(self.drift * self.c1 + self.diffusion * self.c2 - self.r) + [-self.r]
+        self.u = [0] + list(self.drift * self.u1 + self.diffusion * self.u2)
+        self.L = sp.diags([self.l, self.c, self.u], [-1, 0, 1], format='csc')
+
+    def analytical(self, time, x0=None):
+        x0 = self.x0 if x0 is None else x0
         coefficient = 1 / self.xvec / self.vol / np.sqrt(2 * np.pi * time)
-        _exp = -(np.log(self.xvec/self.x0) - (self.r-0.5*self.vol**2) * time) ** 2 / (2 * self.vol ** 2 * time)
+        _exp = -(np.log(self.xvec/x0) - (self.r-0.5*self.vol**2) * time) ** 2 / (2 * self.vol ** 2 * time)
         return coefficient * np.exp(_exp)
 
 
@@ -0,0 +1,117 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+Cache
+--------------------------
+
+Description:
+Bounded LRU cache and fingerprint helper shared by the solvers. Expensive objects that only
+depend on the grid and the model parameters (eigen decompositions, factorizations, propagators)
+are stored here so that repeated observation days and contracts with the same setup reuse them.
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+"""
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+def fingerprint(*args):
+    """ 根据数组与标量生成哈希键，数组按内容（dtype、shape、字节）参与哈希 """
+    h = hashlib.sha1()
+    for arg in args:
+        if isinstance(arg, np.ndarray):
+            arr = np.ascontiguousarray(arg)
+            h.update(str((arr.dtype.str, arr.shape)).encode())
+            h.update(arr.tobytes())
+        else:
+            h.update(repr(arg).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+def nbytes_of(value):
+    """ 粗略估计缓存对象占用的内存（只统计 numpy 数组） """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes_of(v) for v in value)
+    if isinstance(value, dict):
+        return sum(nbytes_of(v) for v in value.values())
+    if hasattr(value, '__dict__'):
+        return sum(nbytes_of(v) for v in vars(value).values())
+    return 0
+
+
+class LRUCache:
+    """ 最近最少使用缓存
+
+        maxsize:   最多保存的条目数，0 表示不缓存
+        max_bytes: 可选的内存上限（字节），超过时按 LRU 顺序淘汰
+    """
+    def __init__(self, maxsize=32, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()   # key -> (value, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+        self.misses += 1
+        return default
+
+    def put(self, key, value, nbytes=None):
+        if self.maxsize == 0:
+            return value
+        nbytes = nbytes_of(value) if nbytes is None else nbytes
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return value  # 单个对象超过上限，不缓存
+        if key in self._data:
+            self.nbytes -= self._data.pop(key)[1]
+        self._data[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while len(self._data) > self.maxsize or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+        return value
+
+    def get_or_create(self, key, factory):
+        """ 命中则返回缓存，否则调用 factory() 生成并缓存 """
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, factory())
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'nbytes': self.nbytes,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
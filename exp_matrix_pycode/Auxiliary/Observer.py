@@ -0,0 +1,140 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+Observer
+--------------------------
+
+Description:
+Event interface of the solvers. Diagnostics (prints, mass-conservation asserts and debug
+DataFrames) are subscribers instead of code in the stepping loop. The solver only builds an
+event payload when the event has subscribers (`event in bus`), so a run without subscribers pays
+one dict lookup per event.
+
+Events emitted by SnowballMatrixApproximation / Snowball:
+
+    grid_changed:          time, names, proba_before, proba_after, old_xvec, old_dx, old_u, xvec, dx, u
+    transferred:           time, kind ('knock_out' | 'knock_in'), incre_out_proba
+    observation_completed: time, incre_out_proba
+    probability_computed:  out_proba, in_proba, dnt_proba
+    priced:                out_price_process, out_price, in_price, dnt_price, total_price
+
+A subscriber is any object with `on_<event>(**payload)` methods, attached with `EventBus.attach`.
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+"""
+import logging
+import numpy as np
+import pandas as pd
+
+EVENTS = ('grid_changed', 'transferred', 'observation_completed', 'probability_computed', 'priced')
+
+
+class EventBus:
+
+    def __init__(self, subscribers=None):
+        self._callbacks = {}   # event -> [callback]
+        for subscriber in subscribers or []:
+            self.attach(subscriber)
+
+    def __contains__(self, event):
+        return event in self._callbacks
+
+    def subscribe(self, event, callback):
+        if event not in EVENTS:
+            raise ValueError(f"Unknown event: {event}")
+        self._callbacks.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        callbacks = self._callbacks.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self._callbacks.pop(event, None)
+
+    def attach(self, subscriber):
+        """ 订阅 subscriber 中所有 on_<event> 方法 """
+        for event in EVENTS:
+            callback = getattr(subscriber, f'on_{event}', None)
+            if callback is not None:
+                self.subscribe(event, callback)
+        return subscriber
+
+    def detach(self, subscriber):
+        for event in EVENTS:
+            callback = getattr(subscriber, f'on_{event}', None)
+            if callback is not None:
+                self.unsubscribe(event, callback)
+
+    def emit(self, event, **payload):
+        for callback in self._callbacks.get(event, ()):
+            callback(**payload)
+
+
+class LoggingSubscriber:
+    """ 输出求解过程中的概率与价格（替代原有的 print） """
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logging.getLogger('snowball') if logger is None else logger
+        self.level = level
+
+    def on_transferred(self, time, kind, incre_out_proba=None):
+        if kind == 'knock_out':
+            self.logger.log(self.level, f"{round(time, 2)}: 增量敲出概率为{incre_out_proba}")
+
+    def on_probability_computed(self, out_proba, in_proba, dnt_proba):
+        self.logger.log(self.level, f"敲出的概率为：{out_proba}")
+        self.logger.log(self.level, f"敲入的概率为：{in_proba}")
+        self.logger.log(self.level, f"不敲出不敲入的概率为：{dnt_proba}")
+        self.logger.log(self.level, f"总概率：{out_proba + in_proba + dnt_proba}")
+
+    def on_priced(self, out_price_process, out_price, in_price, dnt_price, total_price):
+        self.logger.log(self.level, f'*各月敲出部分的价值为：{out_price_process}')
+        self.logger.log(self.level, f'@敲出部分的价值为：{out_price}')
+        self.logger.log(self.level, f'@敲入部分的价值为：{in_price}')
+        self.logger.log(self.level, f'@不敲出不敲入部分的价值为：{dnt_price}')
+        self.logger.log(self.level, f'@雪球的价值为：{total_price}')
+
+
+class MassConservationChecker:
+    """ 检查更换网格（插值）前后每个 PDF 的质量是否守恒 """
+    def __init__(self, rtol=1e-5, atol=1e-8, raise_error=True):
+        self.rtol = rtol
+        self.atol = atol
+        self.raise_error = raise_error
+        self.violations = []   # (time, name, proba_before, proba_after)
+
+    def on_grid_changed(self, time, names, proba_before, proba_after, **kwargs):
+        for name, before, after in zip(names, proba_before, proba_after):
+            if not np.allclose(after, before, rtol=self.rtol, atol=self.atol):
+                self.violations.append((time, name, before, after))
+                if self.raise_error:
+                    raise AssertionError(f"{name} 插值前后的质量不相等")
+
+
+class DataFrameCapture:
+    """ 以 DataFrame 记录每次更换网格前后的 PMF（原 `Debug 组件`）
+
+        before_interpolate[name][time] = (proba, DataFrame[before_interp, dx])
+        after_interpolate[name][time] = (proba, DataFrame[after_interp, dx])
+    """
+    def __init__(self):
+        self.before_interpolate = {}
+        self.after_interpolate = {}
+
+    @staticmethod
+    def get_data(idx, col, ut, dx):
+        df = pd.DataFrame(index=idx)
+        df[col] = ut
+        df['dx'] = dx
+        return df
+
+    def on_grid_changed(self, time, names, proba_before, proba_after, old_xvec, old_dx, old_u, xvec, dx, u):
+        for j, name in enumerate(names):
+            self.before_interpolate.setdefault(name, {})[time] = (
+                proba_before[j], self.get_data(old_xvec, 'before_interp', old_u[j], old_dx))
+            self.after_interpolate.setdefault(name, {})[time] = (
+                proba_after[j], self.get_data(xvec, 'after_interp', u[j].copy(), dx))
@@ -4,15 +4,200 @@
 作者: xta
 日期: 2023年10月26日
 
+Runtime
+--------------------------
+
+Description:
+`runtime` is a wall-clock decorator that returns (elapsed, result).
+
+`PhaseProfiler` builds nested per-phase timings on top of it without changing the return type of
+the profiled functions. Each phase node records its total time, number of calls and exported
+bytes, and its children:
+
+    with PROFILER.phase('propagation'):        # 代码块
+        ...
+
+    @phase('interpolation')                    # 函数
+    def _handle_grid_change(self, _time): ...
+
+The global profiler is switched on by the environment variable SNOWBALL_PROFILE (a directory,
+where one JSON report is written per pricing run, or '1' to only collect), or for a block with
+
+    with profiling('report.json'):
+        sma.get_proba()
+        Snowball(...).get_price()
+
+When it is off, a profiled function costs one attribute lookup and a profiled block returns a
+shared no-op context.
+
+Version History:
+1.0.0 - 2023-10-26
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Add PhaseProfiler, `phase` and `profiling`. `runtime` uses time.perf_counter.
 """
+import os
+import json
 import time
+import functools
+from contextlib import contextmanager, nullcontext
+
+PROFILE_ENV = 'SNOWBALL_PROFILE'
+
 
 def runtime(func):
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = func(*args, **kwargs)
-        end_time = time.time()
+        end_time = time.perf_counter()
         # print(f"'{func.__name__}' function took {end_time - start_time:.2f} seconds to run.")
         return end_time - start_time, result
     wrapper._original = func  # 保存原始函数的引用
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+class _Node:
+
+    __slots__ = ('name', 'time', 'calls', 'nbytes', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.time = 0.0
+        self.calls = 0
+        self.nbytes = 0
+        self.children = {}
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _Node(name)
+        return node
+
+    def as_dict(self):
+        children = [child.as_dict() for child in self.children.values()]
+        return {'name': self.name, 'time': self.time, 'calls': self.calls, 'bytes': self.nbytes,
+                'self_time': self.time - sum(child['time'] for child in children), 'children': children}
+
+
+class _Phase:
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._push(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._pop(time.perf_counter() - self.start)
+        return False
+
+
+class PhaseProfiler:
+
+    _null = nullcontext()
+
+    def __init__(self, enabled=False, report_dir=None):
+        self.enabled = enabled
+        self.report_dir = report_dir   # 每次定价结束时写入 JSON 报告的目录，None 时不写入
+        self.runs = 0
+        self.reset()
+
+    @classmethod
+    def from_env(cls):
+        value = os.environ.get(PROFILE_ENV, '').strip()
+        if value.lower() in ('', '0', 'false', 'off'):
+            return cls()
+        return cls(enabled=True, report_dir=None if value.lower() in ('1', 'true', 'on') else value)
+
+    def reset(self):
+        self.root = _Node('run')
+        self._stack = [self.root]
+        self._start = time.perf_counter()
+
+    def _push(self, name):
+        node = self._stack[-1].child(name)
+        self._stack.append(node)
+
+    def _pop(self, elapsed):
+        node = self._stack.pop()
+        node.time += elapsed
+        node.calls += 1
+
+    def phase(self, name):
+        """ 计时代码块；关闭时返回共享的空上下文 """
+        return _Phase(self, name) if self.enabled else self._null
+
+    def timed(self, name, func, *args, **kwargs):
+        """ 以 `runtime` 计时一次调用，返回 func 的原始结果 """
+        self._push(name)
+        try:
+            elapsed, result = runtime(func)(*args, **kwargs)
+        except BaseException:
+            self._stack.pop()
+            raise
+        self._pop(elapsed)
+        return result
+
+    def add_bytes(self, nbytes):
+        """ 将导出（储存）的字节数计入当前阶段 """
+        self._stack[-1].nbytes += int(nbytes)
+
+    def report(self, **meta):
+        """ 当前的分阶段报告 """
+        self.root.time = time.perf_counter() - self._start
+        self.root.calls = 1
+        return {'meta': meta, 'phases': self.root.as_dict()}
+
+    def dump(self, path, **meta):
+        with open(path, 'w') as json_file:
+            json.dump(self.report(**meta), json_file, indent=2, ensure_ascii=False)
+        return path
+
+    def end_run(self, **meta):
+        """ 一次定价结束：写入报告（若设置了 report_dir）并重新开始计时 """
+        if not self.enabled:
+            return None
+        self.runs += 1
+        if self.report_dir is None:   # 只收集（SNOWBALL_PROFILE=1 或 `profiling` 代码块内）
+            return None
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = self.dump(os.path.join(self.report_dir, f'profile_{os.getpid()}_{self.runs}.json'), **meta)
+        self.reset()
+        return path
+
+
+PROFILER = PhaseProfiler.from_env()
+
+
+def phase(name):
+    """ 将函数计入阶段 name，不改变函数的返回值 """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            return PROFILER.timed(name, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profiling(path=None, **meta):
+    """ 在代码块内开启全局 profiler，结束时返回报告，并在给定 path 时写入 JSON """
+    enabled, report_dir = PROFILER.enabled, PROFILER.report_dir
+    PROFILER.enabled, PROFILER.report_dir = True, None   # 代码块内的报告由 path 决定
+    PROFILER.reset()
+    report = {}
+    try:
+        yield report
+    finally:
+        report.update(PROFILER.report(**meta))
+        if path is not None:
+            PROFILER.dump(path, **meta)
+        PROFILER.enabled, PROFILER.report_dir = enabled, report_dir
+        PROFILER.reset()
@@ -0,0 +1,230 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+SnowballBenchmark
+--------------------------
+
+Description:
+Reproducible benchmark of SnowballMatrixApproximation.get_proba + Snowball.get_price.
+
+A sweep is the cartesian product of the solver options (Nx, Nt, num_eigenvalue, is_uniform,
+is_simplify, is_changed_grid, integrate_method, and any other SnowballMatrixApproximation
+keyword such as eigen_method or propagator) on one contract. Every case records
+
+    time:        best wall time over `repeat` cold runs (the shared caches are cleared first)
+    peak_memory: peak traced allocation of one extra run (tracemalloc, bytes)
+    price / probabilities and their errors against a high-resolution reference price
+
+and the results are written as JSON. `compare` matches the cases of two result files and flags
+the regressions of time, memory and price error.
+
+    python -m Benchmark.SnowballBenchmark run --preset quick --output base.json
+    python -m Benchmark.SnowballBenchmark run --preset quick --output new.json
+    python -m Benchmark.SnowballBenchmark compare base.json new.json
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Clear the remap matrix cache between cold runs.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import tracemalloc
+import numpy as np
+import scipy
+
+from MatrixExponential import SnowballMatrixApproximation as SMA
+
+CONTRACT = {'r': 0.03, 'vol': 0.13, 't': 1, 'x0': 100, 'up': 1.03, 'down': 0.85,
+            'out_coupon': 0.2, 'dividend_coupon': 0.2, 'notional': 100}
+
+PRESETS = {
+    'quick': {'Nx': [100, 200, 500], 'Nt': [330], 'num_eigenvalue': [None], 'is_uniform': [True, False],
+              'is_simplify': [True], 'is_changed_grid': [True, False], 'integrate_method': ['inner_product']},
+    'full': {'Nx': [100, 200, 500, 1000, 2000], 'Nt': [251, 330], 'num_eigenvalue': [None],
+             'is_uniform': [True, False], 'is_simplify': [True, False], 'is_changed_grid': [True, False],
+             'integrate_method': ['inner_product', 'trapz', 'simps']},
+}
+
+# 参考价格：Nx=4000 的细网格，O(Nx) 的 Crank-Nicolson 以很小的时间步长演化（时间误差约 1e-5）
+REFERENCE = {'Nx': 4000, 'Nt': 330, 'is_uniform': False, 'is_simplify': False, 'is_changed_grid': True,
+             'integrate_method': 'inner_product', 'propagator': 'crank_nicolson',
+             'propagator_options': {'max_dt': 1 / 20000}}
+
+METRICS = ('time', 'peak_memory', 'price_error')
+
+
+def case_key(config):
+    """ 用于匹配两次结果中同一个 case 的字符串 """
+    return ','.join(f'{name}={config[name]}' for name in sorted(config))
+
+
+def expand(sweep):
+    """ sweep 中各参数取值的笛卡尔积 """
+    names = list(sweep)
+    return [dict(zip(names, values)) for values in itertools.product(*(sweep[name] for name in names))]
+
+
+def clear_caches():
+    SMA.EIGEN_CACHE.clear()
+    SMA.PROPAGATOR_CACHE.clear()
+    SMA.REMAP_CACHE.clear()
+
+
+def price(config, contract=CONTRACT):
+    """ 按给定的求解参数运行一次 get_proba + get_price """
+    sma = SMA.SnowballMatrixApproximation(r=contract['r'], vol=contract['vol'], t=contract['t'],
+                                          x0=contract['x0'], up=contract['up'], down=contract['down'],
+                                          retain='none', **config)
+    sma.get_proba()
+    *_, total_price = SMA.Snowball(sma.r, contract['out_coupon'], contract['dividend_coupon'],
+                                   contract['notional'], sma).get_price()
+    return {'price': float(total_price), 'out_proba': float(sma.out_proba), 'in_proba': float(sma.in_proba),
+            'dnt_proba': float(sma.dnt_proba)}
+
+
+def run_case(config, contract=CONTRACT, repeat=1, warm=False, memory=True):
+    """ 单个 case 的耗时、峰值内存与结果 """
+    timings = []
+    for _ in range(repeat):
+        if not warm:
+            clear_caches()
+        start_time = time.perf_counter()
+        result = price(config, contract)
+        timings.append(time.perf_counter() - start_time)
+    record = {'config': config, 'time': min(timings), 'timings': timings, **result}
+    if memory:
+        if not warm:
+            clear_caches()
+        tracemalloc.start()
+        try:
+            price(config, contract)
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return record
+
+
+def run(sweep, contract=CONTRACT, reference=REFERENCE, repeat=1, warm=False, memory=True, output=None,
+        verbose=True):
+    """ 运行整个 sweep，返回（并写入 output）结果 """
+    start_time = time.perf_counter()
+    ref = run_case(reference, contract, repeat=1, memory=False) if reference is not None else None
+    records = []
+    for config in expand(sweep):
+        try:
+            record = run_case(config, contract, repeat=repeat, warm=warm, memory=memory)
+        except Exception as e:  # 个别参数组合不可用时记录错误，不中断整个 sweep
+            record = {'config': config, 'error': f'{type(e).__name__}: {e}'}
+        if ref is not None and 'price' in record:
+            record['price_error'] = abs(record['price'] - ref['price'])
+            for name in ('out_proba', 'in_proba', 'dnt_proba'):
+                record[f'{name}_error'] = abs(record[name] - ref[name])
+        records.append(record)
+        if verbose:
+            print(format_record(record))
+    result = {
+        'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                 'numpy': np.__version__, 'scipy': scipy.__version__, 'machine': platform.machine(),
+                 'processor': platform.processor(), 'repeat': repeat, 'warm': warm,
+                 'elapsed': time.perf_counter() - start_time},
+        'contract': contract,
+        'sweep': sweep,
+        'reference': None if ref is None else {**ref, 'config': reference},
+        'records': records,
+    }
+    if output is not None:
+        with open(output, 'w') as json_file:
+            json.dump(result, json_file, indent=2)
+    return result
+
+
+def format_record(record):
+    if 'error' in record:
+        return f"{case_key(record['config'])}: {record['error']}"
+    text = f"{case_key(record['config'])}: {record['time']:.3f}s, price={record['price']:.6f}"
+    if 'peak_memory' in record:
+        text += f", peak={record['peak_memory'] / 2 ** 20:.1f}MB"
+    if 'price_error' in record:
+        text += f", error={record['price_error']:.2e}"
+    return text
+
+
+def compare(baseline, current, rtol=0.1, atol=None):
+    """ 比较两次结果，返回回归列表 [(case, metric, baseline, current)]
+
+        指标超过 max(baseline * (1 + rtol), baseline + atol[metric]) 时视为回归（atol 避免毫秒级的耗时
+        与 1e-6 以下的误差抖动被误报）；baseline 成功而 current 失败也视为回归
+    """
+    atol = {'time': 0.01, 'peak_memory': 2 ** 20, 'price_error': 1e-6} if atol is None else atol
+    baseline = _load(baseline)
+    current = _load(current)
+    base_records = {case_key(record['config']): record for record in baseline['records']}
+    regressions = []
+    for record in current['records']:
+        key = case_key(record['config'])
+        base = base_records.get(key)
+        if base is None or 'error' in base:
+            continue
+        if 'error' in record:
+            regressions.append((key, 'error', None, record['error']))
+            continue
+        for metric in METRICS:
+            if metric not in base or metric not in record:
+                continue
+            if record[metric] > max(base[metric] * (1 + rtol), base[metric] + atol[metric]):
+                regressions.append((key, metric, base[metric], record[metric]))
+    return regressions
+
+
+def _load(result):
+    if isinstance(result, dict):
+        return result
+    with open(result) as json_file:
+        return json.load(json_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of SnowballMatrixApproximation')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    run_parser.add_argument('--sweep', help='JSON 格式的 sweep，覆盖 preset 中的同名参数')
+    run_parser.add_argument('--reference', help='JSON 格式的参考解参数，"null" 表示不计算误差')
+    run_parser.add_argument('--repeat', type=int, default=1)
+    run_parser.add_argument('--warm', action='store_true', help='不清空特征分解与传播矩阵缓存')
+    run_parser.add_argument('--no-memory', action='store_true', help='不统计峰值内存')
+    run_parser.add_argument('--output', default='benchmark.json')
+    compare_parser = commands.add_parser('compare')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--rtol', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        sweep = dict(PRESETS[args.preset])
+        if args.sweep:
+            sweep.update(json.loads(args.sweep))
+        reference = REFERENCE if args.reference is None else json.loads(args.reference)
+        run(sweep, reference=reference, repeat=args.repeat, warm=args.warm, memory=not args.no_memory,
+            output=args.output)
+        print(f'Benchmark 结果已保存到文件: {args.output}')
+        return 0
+
+    regressions = compare(args.baseline, args.current, rtol=args.rtol)
+    for key, metric, base, value in regressions:
+        print(f'[regression] {key}: {metric} {base} -> {value}')
+    print(f'{len(regressions)} regression(s)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,7 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+"""
@@ -0,0 +1,51 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+CoefficientProjection
+--------------------------
+
+Description:
+Project densities onto the eigen subspace. The coefficients c and the residual r solve the
+block system
+
+    | V  I  | | c |   | u |
+    | 0  V^T| | r | = | 0 |
+
+which is reduced with the Schur complement: V^T r = 0 gives (V^T V) c = V^T u and r = u - V c.
+When V is square (all eigenvalues are kept) the residual vanishes and c = V^{-1} u.
+Either way the k x k factorization is computed once per grid, and each day only needs
+triangular solves for all densities at once (multi right-hand side).
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+"""
+import numpy as np
+import scipy.linalg as scl
+
+
+class CoefficientProjector:
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.is_square = vectors.shape[0] == vectors.shape[1]
+        if self.is_square:
+            self.lu = scl.lu_factor(vectors)                  # V = PLU
+        else:
+            self.lu = scl.lu_factor(vectors.T @ vectors)      # Schur 补 V^T V = PLU
+
+    def solve(self, u):
+        """ 求解特征向量对应的系数 c，u 可为单个向量 (N,) 或按列堆叠的多个向量 (N, m) """
+        rhs = u if self.is_square else self.vectors.T @ u
+        return scl.lu_solve(self.lu, rhs, check_finite=False)
+
+    def projection_matrix(self):
+        """ 系数投影矩阵 V^+，满足 c = V^+ u """
+        return self.solve(np.eye(self.vectors.shape[0]))
+
+    def residual(self, u, coefficient):
+        """ 残差 r = u - V c """
+        return u - self.vectors @ coefficient
@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+DensityState
+--------------------------
+
+Description:
+Container that holds all densities (OUT / KI / DNT) of a snowball in one contiguous
+(n_states x N) array. Each PDF reads and writes its own row, so the densities are propagated
+with one matrix product per step and the knock-out / knock-in transfers are vectorized index
+operations on the stacked array.
+
+With `size` > 1 every PDF owns a block of `size` consecutive rows (one per scenario, see
+SnowballBatch) and the barrier indices of the transfers may be arrays with one index per row
+of the block.
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Add blocks of `size` rows per PDF and per-row barrier indices for batched scenarios.
+1.0.2 - 2026-10-18
+    - `clip_negative` takes the columns of the sub-grid a PDF was evolved on.
+"""
+import numpy as np
+
+
+class DensityState:
+
+    def __init__(self, names, n=0, size=1):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.size = size                                      # 每个 PDF 占据的行数
+        self.data = np.zeros((len(self.names) * size, n))   # 每行一个 PDF
+        self.work = np.zeros_like(self.data)                  # 演化时的工作区，避免每步重新分配
+
+    def _block(self, name):
+        i = self.index[name]
+        return i if self.size == 1 else slice(i * self.size, (i + 1) * self.size)
+
+    def __getitem__(self, name):
+        return self.data[self._block(name)]
+
+    def __setitem__(self, name, value):
+        self.data[self._block(name)] = value
+
+    @property
+    def n(self):
+        return self.data.shape[1]
+
+    def resize(self, n):
+        """ 网格点个数变化时重新分配（清零） """
+        if n != self.n:
+            self.data = np.zeros((len(self.names) * self.size, n))
+            self.work = np.zeros_like(self.data)
+        else:
+            self.data[:] = 0
+
+    def rows(self, names):
+        """ 返回 PDF 对应的行；行号连续时返回切片，使 data[rows] 为视图 """
+        idx = [self.index[name] for name in names]
+        if idx == list(range(idx[0], idx[0] + len(idx))):
+            return slice(idx[0] * self.size, (idx[0] + len(idx)) * self.size)
+        return [i * self.size + j for i in idx for j in range(self.size)]
+
+    def _mask(self, idx, above):
+        """ 每行的障碍区域：above 时为 [idx:]，否则为 [:idx + 1]（与切片的含义一致） """
+        col = np.arange(self.n)
+        idx = np.asarray(idx)[:, np.newaxis]
+        if above:
+            return col >= idx % self.n   # idx = -1 时与切片 [-1:] 一致
+        return col <= idx
+
+    def clip_negative(self, rows, cols=slice(None)):
+        """ 求解时有可能会有负数（-1e-18左右），将对应的 PDF 在求解区间 cols 上整体平移 """
+        block = self.data[rows, cols]
+        shift = block.min(axis=1)
+        negative = shift < 0
+        if negative.any():
+            block[negative] -= shift[negative, np.newaxis]
+            self.data[rows, cols] = block
+
+    def knock_out(self, max_idx, sources=('KI', 'DNT'), target='OUT'):
+        """ 敲出：sources 位于 [max_idx:] 的质量转移至 target """
+        if np.ndim(max_idx):
+            mask = self._mask(max_idx, above=True)
+            for source in sources:
+                self.data[self.rows([target])] += self.data[self.rows([source])] * mask
+                self.data[self.rows([source])] *= ~mask
+            return
+        src = self.rows(sources)
+        self.data[self.index[target], max_idx:] += self.data[src, max_idx:].sum(axis=0)
+        self.data[src, max_idx:] = 0
+
+    def knock_in(self, min_idx, source='DNT', target='KI'):
+        """ 敲入：source 位于 [:min_idx + 1] 的质量转移至 target """
+        if np.ndim(min_idx):
+            mask = self._mask(min_idx, above=False)
+            self.data[self.rows([target])] += self.data[self.rows([source])] * mask
+            self.data[self.rows([source])] *= ~mask
+            return
+        src = self.index[source]
+        self.data[self.index[target], :min_idx + 1] += self.data[src, :min_idx + 1]
+        self.data[src, :min_idx + 1] = 0
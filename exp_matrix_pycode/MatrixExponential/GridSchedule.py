@@ -0,0 +1,215 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+GridSchedule
+--------------------------
+
+Description:
+Precomputed grid schedule of SnowballMatrixApproximation for one (t, vol, r, barriers, Nx) key.
+
+The grids only depend on the contract through (r, vol, t, x0, up, down, Nx, Nt) and the grid
+options, so a book with the same tenor and vol bucket rebuilds the same grids, barrier indices,
+operators and remap matrices for every contract. A GridSchedule computes the whole sequence once
+(one grid per knock-out observation day when `is_changed_grid`, otherwise one grid):
+
+    xvec, total_dx        the grid and its control volumes (quadrature weights)
+    min_idx, max_idx      the barrier index pairs
+    operator              the three diagonals of the Fokker Plank operator A
+    remap                 the conservative remap matrix (Auxiliary.Remap) between consecutive grids
+    values, vectors,      the eigen decomposition and the coefficient projection matrix of A
+    projection            (optional, `decompose=True`)
+
+and is passed to the solver with `schedule=`. `save` writes an uncompressed npz, and `load` memory
+maps its arrays (`mmap=True`), so a pricing process starts with everything warm without reading
+the decompositions into memory.
+
+    schedule = GridSchedule.build(r=0.03, vol=0.13, Nx=200, t=1, x0=100, up=1.03, down=0.85, Nt=330,
+                                  is_changed_grid=True, decompose=True)
+    schedule.save('schedule.npz')
+    schedule = GridSchedule.load('schedule.npz')
+    sma = SnowballMatrixApproximation(..., schedule=schedule, remap='conservative')
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+"""
+import json
+import zipfile
+import numpy as np
+import scipy.sparse as sp
+from Auxiliary.Cache import LRUCache
+from Auxiliary.Quadrature import Quadrature
+from Auxiliary.Remap import remap_matrix
+
+# 决定网格序列的参数，求解器的对应参数必须与之相同
+KEY_FIELDS = ('r', 'vol', 't', 'x0', 'up', 'down', 'Nx', 'Nt', 'is_uniform', 'is_simplify', 'is_changed_grid')
+# 只影响特征分解的参数
+EIGEN_FIELDS = ('num_eigenvalue', 'eigen_method')
+
+
+class StoredProjector:
+    """ 由预计算的投影矩阵 V^+ 求系数，接口与 CoefficientProjector 相同 """
+
+    def __init__(self, vectors, projection):
+        self.vectors = vectors
+        self.projection = projection
+
+    def solve(self, u):
+        return self.projection @ u
+
+    def projection_matrix(self):
+        return self.projection
+
+    def residual(self, u, coefficient):
+        return u - self.vectors @ coefficient
+
+
+class GridSchedule:
+
+    def __init__(self, params, arrays):
+        self.params = params                        # KEY_FIELDS (+ EIGEN_FIELDS) 的取值
+        self.arrays = arrays                        # name -> ndarray / memmap
+        self.times = np.asarray(arrays['times'])
+        self._index = {round(float(_time), 12): i for i, _time in enumerate(self.times)}
+        self._quadrature = {}                       # (网格, 积分方法) -> Quadrature，积分权重按需构建后复用
+
+    def __len__(self):
+        return self.times.shape[0]
+
+    @property
+    def has_eigen(self):
+        return 'vectors' in self.arrays
+
+    @classmethod
+    def build(cls, r, vol, Nx, t, x0, up, down, Nt, is_uniform=True, is_simplify=True, is_changed_grid=True,
+              decompose=False, num_eigenvalue=None, eigen_method='general'):
+        """ 使用 SnowballMatrixApproximation 自身的网格与算子构建整个网格序列 """
+        from MatrixExponential.SnowballMatrixApproximation import SnowballMatrixApproximation
+        sma = SnowballMatrixApproximation(r=r, vol=vol, Nx=Nx, t=t, x0=x0, up=up, down=down, Nt=Nt,
+                                          integrate_method='inner_product', num_eigenvalue=num_eigenvalue,
+                                          is_changed_grid=is_changed_grid, is_uniform=is_uniform,
+                                          is_simplify=is_simplify, eigen_method=eigen_method, retain='none',
+                                          eigen_cache=LRUCache(maxsize=0))
+        params = {'r': r, 'vol': vol, 't': t, 'x0': x0, 'up': up, 'down': down, 'Nx': Nx, 'Nt': Nt,
+                  'is_uniform': is_uniform, 'is_simplify': is_simplify, 'is_changed_grid': is_changed_grid}
+        times = sma.out_observe_day if is_changed_grid else sma.out_observe_day[:1]
+        columns = {name: [] for name in ('xvec', 'total_dx', 'min_idx', 'max_idx', 'operator')}
+        eigen = {name: [] for name in ('values', 'vectors', 'projection')}
+        for _time in times:
+            sma._set_grid(_time)
+            sma._set_matrix_simplify() if is_simplify else sma._set_matrix()
+            columns['xvec'].append(sma.xvec)
+            columns['total_dx'].append(sma.total_dx)
+            columns['min_idx'].append(sma.min_idx)
+            columns['max_idx'].append(sma.max_idx)
+            operator = np.zeros((3, sma.xvec.shape[0]))   # 次对角线、对角线、超对角线（末尾补 0）
+            operator[0, :-1] = sma.A.diagonal(-1)
+            operator[1] = sma.A.diagonal()
+            operator[2, :-1] = sma.A.diagonal(1)
+            columns['operator'].append(operator)
+            if decompose:
+                values, vectors, projector = sma._eigen_value_vector()
+                eigen['values'].append(values)
+                eigen['vectors'].append(vectors)
+                eigen['projection'].append(projector.projection_matrix())
+        arrays = {'times': np.asarray(times, dtype=float)}
+        arrays.update({name: np.array(value) for name, value in columns.items()})
+        if decompose:
+            params.update(num_eigenvalue=num_eigenvalue, eigen_method=eigen_method)
+            arrays.update({name: np.array(value) for name, value in eigen.items()})
+        # 相邻网格之间的重映射矩阵，CSR 的各部分首尾相接储存
+        matrices = [remap_matrix(arrays['xvec'][i], arrays['xvec'][i + 1]) for i in range(len(times) - 1)]
+        arrays['remap_offset'] = np.cumsum([0] + [R.nnz for R in matrices])
+        arrays['remap_data'] = np.concatenate([R.data for R in matrices]) if matrices else np.zeros(0)
+        arrays['remap_indices'] = np.concatenate([R.indices for R in matrices]) if matrices else np.zeros(0, int)
+        arrays['remap_indptr'] = np.array([R.indptr for R in matrices]).reshape(len(matrices), Nx + 2)
+        return cls(params, arrays)
+
+    def save(self, path):
+        """ 写入未压缩的 npz（压缩后无法内存映射） """
+        np.savez(path, params=np.array(json.dumps(self.params)), **self.arrays)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ 读取 npz，mmap 时各数组为只读的内存映射 """
+        with np.load(path) as npz:
+            params = json.loads(str(npz['params']))
+            names = [name for name in npz.files if name != 'params']
+            arrays = _mmap_npz(path, names) if mmap else {name: npz[name] for name in names}
+        return cls(params, arrays)
+
+    def index(self, _time):
+        """ _time 当天使用的网格编号 """
+        if not self.params['is_changed_grid']:
+            return 0
+        try:
+            return self._index[round(float(_time), 12)]
+        except KeyError:
+            raise KeyError(f"网格序列中没有时间 {_time} 的网格") from None
+
+    def check(self, **params):
+        """ 求解器参数与网格序列不一致时抛出 ValueError """
+        mismatch = [name for name in KEY_FIELDS if not np.isclose(params[name], self.params[name], rtol=1e-12, atol=0)]
+        if mismatch:
+            raise ValueError(f"网格序列与求解参数不一致: {mismatch}")
+
+    def matches_eigen(self, num_eigenvalue, eigen_method):
+        """ 求解器的特征值个数（None 时为 Nx + 1）与分解方法是否与预计算的分解相同 """
+        if not self.has_eigen:
+            return False
+        stored = self.params['Nx'] + 1 if self.params['num_eigenvalue'] is None else self.params['num_eigenvalue']
+        return stored == num_eigenvalue and self.params['eigen_method'] == eigen_method
+
+    def grid(self, i):
+        """ (xvec, total_dx, min_idx, max_idx) """
+        return (self.arrays['xvec'][i], self.arrays['total_dx'][i], int(self.arrays['min_idx'][i]),
+                int(self.arrays['max_idx'][i]))
+
+    def quadrature(self, i, method):
+        key = (i, method)
+        if key not in self._quadrature:
+            self._quadrature[key] = Quadrature(self.arrays['xvec'][i], self.arrays['total_dx'][i], method)
+        return self._quadrature[key]
+
+    def operator(self, i):
+        """ 第 i 个网格的算子 A (csc) """
+        lower, diag, upper = self.arrays['operator'][i]
+        return sp.diags([lower[:-1], diag, upper[:-1]], [-1, 0, 1], format='csc')
+
+    def eigen(self, i):
+        """ 第 i 个网格的 (values, vectors, projector) """
+        vectors = self.arrays['vectors'][i]
+        return self.arrays['values'][i], vectors, StoredProjector(vectors, self.arrays['projection'][i])
+
+    def remap(self, i):
+        """ 由第 i 个网格到第 i + 1 个网格的重映射矩阵 """
+        start, stop = self.arrays['remap_offset'][i:i + 2]
+        n = self.arrays['xvec'].shape[1]
+        return sp.csr_matrix((self.arrays['remap_data'][start:stop], self.arrays['remap_indices'][start:stop],
+                              self.arrays['remap_indptr'][i]), shape=(n, n))
+
+
+def _mmap_npz(path, names):
+    """ 内存映射未压缩 npz 中的数组：每个成员是一个 .npy，数据位于其本地文件头之后 """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for name in names:
+            info = archive.getinfo(f'{name}.npy')
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{name} 已压缩，无法内存映射")
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else \
+                np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            if np.prod(shape) == 0:   # 空数组无法映射
+                arrays[name] = np.zeros(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                     order='F' if fortran_order else 'C')
+    return arrays
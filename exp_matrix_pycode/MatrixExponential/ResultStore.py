@@ -0,0 +1,127 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+ResultStore
+--------------------------
+
+Description:
+Storage of the intermediate PDFs of a SnowballMatrixApproximation run.
+
+The snapshots (before_transfer / after_transfer / after_interpolation) are written into
+preallocated (n_times x n_states x N) float arrays instead of per-day dict copies. What is kept
+is controlled by `retain`:
+
+    'none':             nothing is stored, for pricing runs that only need prices
+    'observation_days': only the knock-out observation days
+    'all':              every day of tvec (the previous behaviour)
+
+Snapshots on a grid with more points than N grow the arrays once (padding with NaN).
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Count the stored bytes in the current phase of Auxiliary.Runtime.PROFILER.
+"""
+import numpy as np
+from Auxiliary.Runtime import PROFILER
+
+STAGES = ('before_transfer', 'after_transfer', 'after_interpolation')
+RETAIN = ('none', 'observation_days', 'all')
+
+
+class ResultStore:
+
+    def __init__(self, retain, tvec, out_observe_day, names, n):
+        if retain not in RETAIN:
+            raise ValueError(f"Unknown retain mode: {retain}")
+        self.retain = retain
+        self.names = list(names)
+        self.times = np.asarray({'none': [], 'observation_days': out_observe_day, 'all': tvec}[retain], dtype=float)
+        self._position = {self._key(_time): i for i, _time in enumerate(self.times)}
+        self.n = n
+        m = self.times.shape[0]
+        self.data = {stage: np.full((m, len(self.names), n), np.nan) for stage in STAGES}
+        self.size = {stage: np.zeros(m, dtype=int) for stage in STAGES}                    # 快照对应的网格点个数
+        self.recorded = {stage: np.zeros((m, len(self.names)), dtype=bool) for stage in STAGES}
+        self.grid_x = np.full((m, n), np.nan)     # 每个时间点求解结束时的 x vector
+        self.grid_dx = np.full((m, n), np.nan)    # 每个时间点求解结束时的 dx vector
+        self.grid_size = np.zeros(m, dtype=int)
+
+    @staticmethod
+    def _key(_time):
+        return float(_time)  # tvec 中可能存在相差 1e-16 的两个时间点，不能取整
+
+    def position(self, _time):
+        """ 时间点在储存数组中的位置，不储存时返回 None """
+        return self._position.get(self._key(_time))
+
+    def _fit(self, n):
+        """ 网格点个数超过预分配大小时扩容 """
+        if n <= self.n:
+            return
+        pad = n - self.n
+        for stage in STAGES:
+            self.data[stage] = np.pad(self.data[stage], ((0, 0), (0, 0), (0, pad)), constant_values=np.nan)
+        self.grid_x = np.pad(self.grid_x, ((0, 0), (0, pad)), constant_values=np.nan)
+        self.grid_dx = np.pad(self.grid_dx, ((0, 0), (0, pad)), constant_values=np.nan)
+        self.n = n
+
+    def record(self, stage, _time, data, rows):
+        """ 储存 data[rows]（按行堆叠的 PDF）在 _time 的快照 """
+        i = self.position(_time)
+        if i is None:
+            return
+        n = data.shape[1]
+        self._fit(n)
+        self.data[stage][i, rows, :n] = data[rows]
+        self.size[stage][i] = n
+        self.recorded[stage][i, rows] = True
+        if PROFILER.enabled:
+            PROFILER.add_bytes(self.data[stage][i, rows, :n].nbytes)
+
+    def record_grid(self, _time, xvec, dx):
+        i = self.position(_time)
+        if i is None:
+            return
+        n = xvec.shape[0]
+        self._fit(n)
+        self.grid_x[i, :n] = xvec
+        self.grid_dx[i, :n] = dx
+        self.grid_size[i] = n
+        if PROFILER.enabled:
+            PROFILER.add_bytes(xvec.nbytes + dx.nbytes)
+
+    def get(self, stage, name, _time):
+        """ 读取某个 PDF 在 _time 的快照 """
+        i = self.position(_time)
+        j = self.names.index(name)
+        if i is None or not self.recorded[stage][i, j]:
+            raise KeyError(f"{name} {stage} at {_time} is not retained (retain='{self.retain}')")
+        return self.data[stage][i, j, :self.size[stage][i]]
+
+    def xvec(self, _time):
+        i = self.position(_time)
+        if i is None or not self.grid_size[i]:
+            raise KeyError(f"xvec at {_time} is not retained (retain='{self.retain}')")
+        return self.grid_x[i, :self.grid_size[i]]
+
+    def dx(self, _time):
+        i = self.position(_time)
+        if i is None or not self.grid_size[i]:
+            raise KeyError(f"dx at {_time} is not retained (retain='{self.retain}')")
+        return self.grid_dx[i, :self.grid_size[i]]
+
+    def as_dict(self, stage, name):
+        """ 兼容旧接口：{time: PDF} """
+        j = self.names.index(name)
+        return {_time: self.data[stage][i, j, :self.size[stage][i]]
+                for i, _time in enumerate(self.times) if self.recorded[stage][i, j]}
+
+    def grid_dict(self, attr='xvec'):
+        """ 兼容旧接口：{time: xvec} 或 {time: dx} """
+        grid = self.grid_x if attr == 'xvec' else self.grid_dx
+        return {_time: grid[i, :self.grid_size[i]] for i, _time in enumerate(self.times) if self.grid_size[i]}
@@ -0,0 +1,236 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+SnowballBackward
+--------------------------
+
+Description:
+Backward Kolmogorov pricing of the snowball on the SnowballDiscrete grid and operators.
+
+The forward solver (SnowballMatrixApproximation) evolves densities from one spot x0, so each spot
+bump reruns it. Here the value V(tau, x) is evolved backwards from maturity with dV/dtau = L V
+(SnowballDiscrete._set_backward_matrix), which gives the price for every spot of the grid in one
+pass. Delta and gamma are the same finite difference stencils applied to V.
+
+Three value layers are held in one stacked (3 x N) array, mirroring the densities of the
+forward solver:
+
+    OUT: value of the knocked-out state, i.e. the coupon R_k = notional * out_coupon * T_k of the
+         next knock-out observation day T_k, discounted to the current time by the operator
+    KI:  value of a knocked-in contract that is still alive
+    DNT: value of a contract that has neither knocked out nor knocked in
+
+On a knock-out observation day the KI and DNT values above the up barrier are replaced by OUT
+(knock-out), and on every day of tvec the DNT values below the down barrier are replaced by KI
+(knock-in). The observation days (tvec) and barrier indices are the same as in the forward solver,
+so V(0, x0) is directly comparable with Snowball.get_price. `compare_eigen_methods` checks that
+eigen_method='tridiagonal' reproduces 'general' on the whole value ladder, not only at x0.
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Add `compare_eigen_methods`, the ladder check of the tridiagonal against the general decomposition.
+"""
+import numpy as np
+import scipy.linalg as scl
+import scipy.interpolate as spi
+from scipy.stats import lognorm
+from Auxiliary.NonUniformGrid import generate_custom_grid
+from Auxiliary.Cache import LRUCache, fingerprint
+from Auxiliary.Runtime import PROFILER, phase
+from AnalyticalMethod.SnowballFokkerPlank import SnowballDiscrete
+from MatrixExponential.CoefficientProjection import CoefficientProjector
+from MatrixExponential.TridiagonalEigen import SymmetricTridiagonalDecomposition
+from MatrixExponential.KrylovPropagator import KrylovPropagator
+from MatrixExponential.DensityState import DensityState
+from MatrixExponential.SnowballMatrixApproximation import EIGEN_CACHE, PROPAGATOR_CACHE
+from FiniteDifference.CrankNicolson import CrankNicolsonPropagator
+
+
+class SnowballBackward(SnowballDiscrete):
+
+    def __init__(self, r, vol, Nx, t, x0, up, down, Nt, out_coupon, dividend_coupon, notional=1,
+                 is_uniform=True, eigen_method='general', propagator='eigen', propagator_options=None,
+                 eigen_cache=None, propagator_cache=None):
+        super().__init__(r, vol, Nx, t, x0, up, down)
+        self.out_coupon = out_coupon
+        self.dividend_coupon = dividend_coupon
+        self.notional = notional
+        self.is_uniform = is_uniform
+        if eigen_method not in ('general', 'tridiagonal'):
+            raise ValueError(f"Unknown eigen_method: {eigen_method}")
+        self.eigen_method = eigen_method
+        if propagator not in ('eigen', 'krylov', 'crank_nicolson'):
+            raise ValueError(f"Unknown propagator: {propagator}")
+        self.propagator = propagator
+        self.propagator_options = {} if propagator_options is None else propagator_options
+        self.eigen_cache = EIGEN_CACHE if eigen_cache is None else eigen_cache
+        self.propagator_cache = PROPAGATOR_CACHE if propagator_cache is None else propagator_cache
+        self.stepper = None
+        self.operator_key = None
+
+        # 与正向求解相同的观察日
+        self.out_observe_day = np.arange(30, self.t * 360 + 30, 30) / 360
+        num = Nt - self.out_observe_day.shape[0]
+        self.other_time = np.linspace(1 / 12, self.t, num + 2)[1:-1]
+        self.tvec = np.unique(np.sort(np.concatenate((self.out_observe_day, self.other_time))))
+
+        self.error = 1e-15              # 截断的概率
+        self.dense_range = self.x0 * 0.05
+        self.state = DensityState(['OUT', 'KI', 'DNT'])  # 三层价值，按行堆叠
+        self.value = None               # t=0 时各网格点的价值 V(0, x)
+        self.delta = None
+        self.gamma = None
+
+    @phase('grid')
+    def _set_grid(self):
+        """ 固定网格：取到期日 GBM 分布的 [error, 1-error] 分位数，覆盖整个存续期 """
+        s = self.vol * np.sqrt(self.t)
+        scale = np.exp((self.r - 0.5 * self.vol ** 2) * self.t) * self.x0
+        self.x_min = lognorm.ppf(self.error, s, scale=scale)
+        self.x_max = lognorm.ppf(1 - self.error, s, scale=scale)
+        if self.is_uniform:
+            self.xvec = np.linspace(self.x_min, self.x_max, self.Nx + 1)
+        else:
+            self.xvec = generate_custom_grid(self.x_min, self.x_max, self.down, self.up, self.Nx + 1,
+                                             dense_range=self.dense_range, dense_factor=2)
+        self._dx = np.diff(self.xvec)
+        # 与正向求解相同的障碍位置：[:min_idx + 1] 敲入，[max_idx:] 敲出
+        self.min_idx = np.searchsorted(self.xvec, self.down, side='left') - 1
+        self.max_idx = np.searchsorted(self.xvec, self.up, side='right')
+
+    def _decompose(self):
+        with PROFILER.phase('operator'):
+            self._set_backward_matrix()
+        if self.propagator != 'eigen':
+            stepper = KrylovPropagator if self.propagator == 'krylov' else CrankNicolsonPropagator
+            self.stepper = stepper(self.L, **self.propagator_options)
+            return
+        key = fingerprint('backward', self.xvec, self.r, self.vol, self.eigen_method)
+        self.operator_key = key
+        entry = self.eigen_cache.get(key)
+        if entry is None:
+            entry = self._eigen_value_vector()
+            for arr in entry[:2]:
+                arr.flags.writeable = False
+            self.eigen_cache.put(key, entry)
+        self.values, self.vectors, self.projector = entry
+
+    @phase('eigendecomposition')
+    def _eigen_value_vector(self):
+        if self.eigen_method == 'tridiagonal':
+            projector = SymmetricTridiagonalDecomposition(self.L)
+            return projector.values, projector.vectors, projector
+        values, vectors = scl.eig(self.L.toarray())
+        return values, vectors, CoefficientProjector(vectors)
+
+    def _get_propagator(self, dt):
+        """ P(dt) = V exp(Λ dt) V^-1，按 (网格, dt) 缓存 """
+        key = (self.operator_key, round(dt, 12))
+        P = self.propagator_cache.get(key)
+        if P is None:
+            projection = self.propagator_cache.get((self.operator_key, 'projection'))
+            if projection is None:
+                projection = self.projector.projection_matrix()
+                self.propagator_cache.put((self.operator_key, 'projection'), projection)
+            P = np.real((self.vectors * np.exp(np.real(self.values) * dt)) @ projection)
+            P.flags.writeable = False
+            self.propagator_cache.put(key, P)
+        return P
+
+    @phase('propagation')
+    def _propagate(self, dt):
+        """ 三层价值一起向前（剩余期限增加的方向）演化 dt """
+        if dt <= 0:
+            return
+        if self.propagator != 'eigen':
+            self.state.data[:] = self.stepper.propagate(self.state.data.T, dt).T
+        else:
+            np.matmul(self.state.data, self._get_propagator(dt).T, out=self.state.work)
+            self.state.data, self.state.work = self.state.work, self.state.data
+
+    def _set_terminal_condition(self):
+        """ 到期日的价值：敲入承担跌幅，未敲出未敲入得到红利票息（敲出票息在 `_observe` 中设置） """
+        self.state.resize(self.xvec.shape[0])
+        self.state['KI'] = self.notional * np.minimum(self.xvec - self.x0, 0) / self.x0
+        self.state['DNT'] = self.notional * self.dividend_coupon * self.t
+
+    @phase('transfer')
+    def _observe(self, _time):
+        """ 观察日的边界条件：先敲入再敲出，与正向求解中 knock_in / knock_out 的顺序一致 """
+        ki, dnt, out = self.state.index['KI'], self.state.index['DNT'], self.state.index['OUT']
+        data = self.state.data
+        data[dnt, :self.min_idx + 1] = data[ki, :self.min_idx + 1]   # DNT Knock-in --> KI
+        if _time in self.out_observe_day:
+            data[out] = self.notional * self.out_coupon * _time           # 当日敲出的票息
+            data[[ki, dnt], self.max_idx:] = data[out, self.max_idx:]  # DNT, KI Knock-out --> OUT
+
+    @phase('probability')
+    def solve(self):
+        """ 由到期日反向求解至 t=0，返回各网格点的价值 """
+        self._set_grid()
+        self._decompose()
+        self._set_terminal_condition()
+        times = self.tvec[::-1]
+        for i, _time in enumerate(times):
+            if i > 0:
+                self._propagate(times[i - 1] - _time)
+            self._observe(_time)
+        self._propagate(times[-1])   # 第一个观察日之前不再观察
+        self.value = self.state['DNT'].copy()
+        self.delta, self.gamma = self._greeks(self.value)
+        return self.value
+
+    def _greeks(self, value):
+        """ 使用与算子相同的非均匀差分格式计算 delta / gamma，边界点取相邻点的值 """
+        delta = np.empty_like(value)
+        gamma = np.empty_like(value)
+        delta[1:-1] = self.l1 * value[:-2] + self.c1 * value[1:-1] + self.u1 * value[2:]
+        gamma[1:-1] = self.l2 * value[:-2] + self.c2 * value[1:-1] + self.u2 * value[2:]
+        delta[[0, -1]] = delta[[1, -2]]
+        gamma[[0, -1]] = gamma[[1, -2]]
+        return delta, gamma
+
+    def price_at(self, spot=None):
+        """ 插值得到任意标的价格（默认 x0）的 (价值, delta, gamma) """
+        spot = self.x0 if spot is None else spot
+        result = tuple(spi.CubicSpline(self.xvec, arr)(spot) for arr in (self.value, self.delta, self.gamma))
+        return tuple(map(float, result)) if np.ndim(spot) == 0 else result
+
+    def get_price(self):
+        """ 与 Snowball.get_price 对应：返回 x0 处的价值、delta、gamma """
+        if self.value is None:
+            self.solve()
+        return self.price_at()
+
+
+def compare_eigen_methods(**kwargs):
+    """ 'tridiagonal' 与 'general' 在整个价值阶梯（所有网格点）上的最大绝对差，不使用共享缓存 """
+    ladders = []
+    for eigen_method in ('general', 'tridiagonal'):
+        sb = SnowballBackward(eigen_method=eigen_method, eigen_cache=LRUCache(maxsize=0),
+                              propagator_cache=LRUCache(maxsize=0), **kwargs)
+        ladders.append(sb.solve())
+    return float(np.max(np.abs(ladders[0] - ladders[1])))
+
+
+if __name__ == '__main__':
+    from MatrixExponential.SnowballMatrixApproximation import SnowballMatrixApproximation, Snowball
+    r, vol, Nx, Nt, x0, t, up, down = 0.03, 0.13, 1000, 330, 100, 1, 1.03, 0.85
+    sma = SnowballMatrixApproximation(r=r, vol=vol, Nx=Nx, t=t, x0=x0, up=up, down=down, Nt=Nt,
+                                      integrate_method='inner_product', is_changed_grid=True, is_uniform=False,
+                                      is_simplify=False, retain='none')
+    sma.get_proba()
+    *_, forward_price = Snowball(r, 0.2, 0.2, 100, sma).get_price()
+    sb = SnowballBackward(r=r, vol=vol, Nx=Nx, t=t, x0=x0, up=up, down=down, Nt=Nt, out_coupon=0.2,
+                          dividend_coupon=0.2, notional=100, is_uniform=False)
+    price, delta, gamma = sb.get_price()
+    print(f'正向求解雪球的价值为：{forward_price}')
+    print(f'反向求解雪球的价值为：{price}, delta: {delta}, gamma: {gamma}')
+    difference = compare_eigen_methods(r=r, vol=vol, Nx=300, t=t, x0=x0, up=up, down=down, Nt=Nt, out_coupon=0.2,
+                                       dividend_coupon=0.2, notional=100, is_uniform=False)
+    print(f'tridiagonal 与 general 在整个价值阶梯上的最大差：{difference:.3e}')
@@ -0,0 +1,237 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+SnowballBatch
+--------------------------
+
+Description:
+Batch pricing of snowball scenarios (r, vol, up, down, out_coupon, dividend_coupon).
+
+The operator A only depends on (r, vol) and the grid; on a uniform grid the grid does not depend
+on the barriers either, and the coupons only enter Snowball.get_price. `price_scenarios` therefore
+groups the scenarios by operator, and every group is solved by one SnowballBatch: the OUT / KI /
+DNT densities of all barrier pairs of the group are stacked in one DensityState (one block of rows
+per PDF), so each step is one GEMM with the shared propagator, and the transfers use one barrier
+index per row. The coupons are priced afterwards from the probabilities, which are shared by all
+scenarios with the same barriers.
+
+On a non-uniform grid (`is_uniform=False`) the grid is refined around the barriers, so the
+barriers are part of the operator key and each barrier pair is its own group.
+
+The eigendecomposition and the propagators are shared by the whole group, so the cost of a group
+is the daily propagation of the stacked densities. Between two knock-out observation days the
+knock-in only moves mass from DNT to KI and KI + DNT evolves without barriers, so with the eigen
+propagator the KI rows hold KI + DNT during the month and are propagated once per observation
+period; only the DNT rows are propagated every day.
+
+    surface = price_scenarios(vol=np.linspace(0.1, 0.3, 20)[:, None], up=np.linspace(1.0, 1.1, 20))
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Add `spot`, the initial spot of each scenario with the barriers kept at up * x0 / down * x0.
+1.0.2 - 2026-10-18
+    - `remap='conservative'` remaps all scenarios with the shared sparse remap matrix.
+1.0.3 - 2026-10-18
+    - Propagate KI + DNT once per observation period, only DNT daily (eigen propagator).
+1.0.4 - 2026-10-18
+    - Renormalize the interpolated scenarios with SnowballMatrixApproximation._rescale_mass, so an empty
+      PDF stays zero as in the single solver.
+"""
+import numpy as np
+import pandas as pd
+import scipy.interpolate as spi
+from Auxiliary.Runtime import phase
+from MatrixExponential.DensityState import DensityState
+from MatrixExponential.SnowballMatrixApproximation import SnowballMatrixApproximation
+
+FIELDS = ('r', 'vol', 'up', 'down', 'out_coupon', 'dividend_coupon')
+RESULTS = ('price', 'out_price', 'in_price', 'dnt_price', 'out_proba', 'in_proba', 'dnt_proba')
+
+
+class SnowballBatch(SnowballMatrixApproximation):
+    """ 共享同一算子 (r, vol, 网格) 的多组障碍价位，各 PDF 按情景堆叠后一起演化 """
+
+    def __init__(self, r, vol, Nx, t, x0, up, down, Nt, integrate_method, spot=None, **kwargs):
+        up = np.atleast_1d(np.asarray(up, dtype=float))
+        down = np.atleast_1d(np.asarray(down, dtype=float))
+        if spot is None:
+            up, down = np.broadcast_arrays(up, down)
+        else:
+            up, down, spot = np.broadcast_arrays(up, down, np.asarray(spot, dtype=float))
+        kwargs['retain'] = 'none'   # 批量定价不储存中间结果
+        super().__init__(r, vol, Nx, t, x0, up[0], down[0], Nt, integrate_method, **kwargs)
+        if not self.is_uniform and (np.ptp(up) > 0 or np.ptp(down) > 0):
+            raise ValueError("非均匀网格依赖障碍价位，不同障碍价位的情景不能共享算子")
+        self.ups = up * self.x0
+        self.downs = down * self.x0
+        self.size = up.shape[0]
+        # 每个情景的初始标的价格（障碍价位与敲入收益仍以 x0 为基准），用于 spot bump
+        self.spot = spot
+        self.state = DensityState(['OUT', 'KI', 'DNT'], size=self.size)
+        for pdf in self.pdf_list:
+            pdf.state = self.state
+        self.last_xvec = {}   # (PDF, 情景) -> 插值之前的 x vector (truncated)
+        # 两个敲出观察日之间 KI 行暂存 KI + DNT（P(a) P(b) = P(a + b) 只对特征分解精确成立）
+        self.lump_knock_in = self.propagator == 'eigen'
+
+    def _set_grid(self, _time):
+        super()._set_grid(_time)
+        # 每个情景各自的障碍位置，含义与 index_of_first 相同
+        self.min_idx = np.searchsorted(self.xvec, self.downs, side='left') - 1
+        self.max_idx = np.searchsorted(self.xvec, self.ups, side='right')
+        self.max_idx[self.max_idx >= self.xvec.size] = -1
+
+    def _block(self, pdf):
+        """ PDF 对应的 (情景, N) 视图（只有一个情景时也保持二维） """
+        return self.state.data[self.state.rows([pdf.name])]
+
+    def _integrate_from(self, u, start):
+        """ 第 s 行在 xvec[start[s]:] 上的积分，相同起点的行一起计算 """
+        result = np.empty(u.shape[0])
+        for idx in np.unique(start):
+            rows = start == idx
+            result[rows] = self.quadrature.integrate(u[rows], start=idx)
+        return result
+
+    def _initialize_conditions(self, _time):
+        self._set_grid(_time)
+        self.state.resize(self.xvec.shape[0])
+        x0 = None if self.spot is None else self.spot[:, np.newaxis]
+        u = np.broadcast_to(self.analytical(_time, x0), (self.size, self.xvec.shape[0]))
+        ko = self.state._mask(self.max_idx, above=True)
+        ki = self.state._mask(self.min_idx, above=False)
+        self.incre_out_proba[_time] = self._integrate_from(u, self.max_idx)  # 增量敲出概率
+        self._block(self.OUT)[:] = u * ko
+        self._block(self.KI)[:] = u * ki
+        self._block(self.DNT)[:] = u * ~(ko | ki)
+
+    @phase('interpolation')
+    def _handle_grid_change(self, _time):
+        if self.remap == 'conservative':   # 重映射矩阵与情景无关，所有行一次完成
+            return super()._handle_grid_change(_time)
+        proba_before = {pdf.name: self.quadrature.integrate(self._block(pdf)) for pdf in self.pdf_list}
+        tck = {}
+        for pdf in self.pdf_list:
+            u0 = self._block(pdf)
+            for s in range(self.size):
+                support = self._support(pdf.name, s)
+                self.last_xvec[pdf.name, s] = self.xvec[support]
+                tck[pdf.name, s] = spi.splrep(self.xvec[support], u0[s, support], k=3)
+        self._set_grid(_time)
+        self.state.resize(self.xvec.shape[0])
+        for pdf in self.pdf_list:
+            u0 = self._block(pdf)
+            for s in range(self.size):
+                last_xvec = self.last_xvec[pdf.name, s]
+                within_range = (self.xvec >= last_xvec.min()) & (self.xvec <= last_xvec.max())
+                u0[s, within_range] = spi.splev(self.xvec[within_range], tck[pdf.name, s])
+            u0[u0 < 0] = 0
+            self._rescale_mass(u0, proba_before[pdf.name], pdf.name)  # Normalize
+
+    def _support(self, name, s):
+        """ 与 PDF.xvec_pdf 相同的插值区间 """
+        min_idx, max_idx = self.min_idx[s], self.max_idx[s]
+        if name == 'OUT':
+            return slice(None)
+        if name == 'KI':
+            return slice(None, max_idx)
+        return slice(min_idx + 1, max_idx)
+
+    def _handle_out_observe_day(self, _time):
+        super()._handle_out_observe_day(_time)
+        if self.lump_knock_in and _time < self.out_observe_day[-1]:
+            self._block(self.KI)[:] += self._block(self.DNT)   # KI 行暂存 KI + DNT
+
+    def _update_conditions_for_subsequent_days(self, _time):
+        self._propagate(self.pdf_list, _time)
+        if self.lump_knock_in:   # 由 KI + DNT 恢复 KI
+            self._block(self.KI)[:] -= self._block(self.DNT)
+            self.state.clip_negative(self.state.rows([self.KI.name]))
+        self.incre_out_proba[_time] = self._integrate_from(self._block(self.KI) + self._block(self.DNT), self.max_idx)
+        self.state.knock_in(self.min_idx)
+        self.state.knock_out(self.max_idx)
+        if self.is_changed_grid:
+            self._handle_grid_change(_time)
+
+    def _normalize_results(self, _time):
+        """ 每个情景分别归一化 """
+        numerical_proba = sum(self.quadrature.integrate(self._block(pdf)) for pdf in self.pdf_list)
+        analytical_proba = 1 - 2 * self.error
+        self.state.data *= np.tile(analytical_proba / numerical_proba, len(self.pdf_list))[:, np.newaxis]
+
+    def _handle_non_out_observe_day(self, _time):
+        pdfs = [self.DNT] if self.lump_knock_in else [self.KI, self.DNT]
+        self._propagate(pdfs, _time)
+        for pdf in pdfs:
+            pdf.last_time = _time
+        if self.lump_knock_in:   # 敲入的质量已包含在 KI 行（KI + DNT）中
+            self._block(self.DNT)[:] *= ~self.state._mask(self.min_idx, above=False)
+        else:
+            self.state.knock_in(self.min_idx)
+
+    def _calculate_display_result(self):
+        self.out_proba, self.in_proba, self.dnt_proba = (self.quadrature.integrate(self._block(pdf))
+                                                         for pdf in self.pdf_list)
+
+    @phase('pricing')
+    def get_price(self, out_coupon, dividend_coupon, notional=1, scenario=None):
+        """ 与 Snowball.get_price 相同的定价，coupon 可为每个定价对应一个值的数组，
+            scenario 为每个定价对应的障碍情景编号（默认与情景一一对应） """
+        scenario = np.arange(self.size) if scenario is None else np.asarray(scenario)
+        incre_out_proba = np.array(list(self.incre_out_proba.values()))[:, scenario]   # (敲出观察日, 定价)
+        adj_incre_out_proba = incre_out_proba / incre_out_proba.sum(axis=0) * self.out_proba[scenario]
+        discount = np.exp(-self.r * self.out_observe_day)
+        out_price = (discount * self.out_observe_day) @ adj_incre_out_proba * out_coupon
+        dnt_price = discount[-1] * self.dnt_proba[scenario] * self.t * dividend_coupon
+        in_payoff = np.where(self.xvec < self.x0, (self.xvec - self.x0) / self.x0, 0)
+        in_price = discount[-1] * self.quadrature.integrate(in_payoff * self._block(self.KI), method='simps')[scenario]
+        total_price = out_price + in_price + dnt_price
+        return {'price': total_price * notional, 'out_price': out_price * notional,
+                'in_price': in_price * notional, 'dnt_price': dnt_price * notional,
+                'out_proba': self.out_proba[scenario], 'in_proba': self.in_proba[scenario],
+                'dnt_proba': self.dnt_proba[scenario]}
+
+
+def scenario_grid(**axes):
+    """ 各参数取值的笛卡尔积，返回 {name: 展平后的数组} """
+    names = list(axes)
+    mesh = np.meshgrid(*(np.atleast_1d(axes[name]) for name in names), indexing='ij')
+    return {name: m.ravel() for name, m in zip(names, mesh)}
+
+
+def price_scenarios(r=0.03, vol=0.13, up=1.03, down=0.85, out_coupon=0.2, dividend_coupon=None, notional=100,
+                    t=1, x0=100, Nx=200, Nt=330, integrate_method='inner_product', **kwargs):
+    """ 批量定价，参数按 numpy 规则广播。返回每个情景一行的 DataFrame：
+        r, vol, up, down, out_coupon, dividend_coupon, price, out_price, in_price, dnt_price,
+        out_proba, in_proba, dnt_proba """
+    dividend_coupon = out_coupon if dividend_coupon is None else dividend_coupon
+    arrays = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (r, vol, up, down, out_coupon, dividend_coupon)))
+    scenarios = pd.DataFrame({name: arr.ravel() for name, arr in zip(FIELDS, arrays)})
+    result = pd.DataFrame(np.nan, index=scenarios.index, columns=list(RESULTS))
+    is_uniform = kwargs.get('is_uniform', True)
+    keys = ['r', 'vol'] if is_uniform else ['r', 'vol', 'up', 'down']
+    for key, group in scenarios.groupby(keys, sort=False):
+        _r, _vol = key[:2]
+        barriers, scenario = np.unique(group[['up', 'down']].to_numpy(), axis=0, return_inverse=True)
+        batch = SnowballBatch(r=_r, vol=_vol, Nx=Nx, t=t, x0=x0, up=barriers[:, 0], down=barriers[:, 1], Nt=Nt,
+                              integrate_method=integrate_method, **kwargs)
+        batch.get_proba()
+        prices = batch.get_price(group['out_coupon'].to_numpy(), group['dividend_coupon'].to_numpy(), notional,
+                                 scenario=scenario.ravel())
+        result.loc[group.index, list(RESULTS)] = np.column_stack([prices[name] for name in RESULTS])
+    return pd.concat([scenarios, result], axis=1)
+
+
+if __name__ == '__main__':
+    import time
+    vols = np.linspace(0.10, 0.30, 20)
+    ups = np.linspace(1.00, 1.10, 20)
+    start_time = time.time()
+    surface = price_scenarios(vol=vols[:, np.newaxis], up=ups[np.newaxis, :])
+    print(f"{len(surface)} 个情景耗时 {time.time() - start_time:.3f}s")
+    print(surface.pivot(index='vol', columns='up', values='price').round(4))
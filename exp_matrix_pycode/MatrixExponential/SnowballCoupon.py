@@ -0,0 +1,128 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+SnowballCoupon
+--------------------------
+
+Description:
+Fair coupon / break-even solver on top of one probability run.
+
+Once get_proba has run, Snowball.get_price is linear in the coupons:
+
+    price = notional * (out_leg * out_coupon + dnt_leg * dividend_coupon + in_leg)
+
+    out_leg = sum_k D(T_k) * T_k * adj_incre_out_proba_k     (value of a unit knock-out coupon)
+    dnt_leg = D(t) * t * dnt_proba                          (value of a unit dividend coupon)
+    in_leg  = D(t) * int min((x - x0) / x0, 0) KI(x) dx       (knock-in loss, simps)
+
+so the legs are computed once and the fair coupon, the price of any vector of coupons and the
+break-even for a target price (e.g. an upfront) follow in closed form. The discounting D(T) is
+exp(-r T) of the solver by default; a flat rate or a discount factor function D(T) can replace it
+without rerunning the densities. A SnowballBatch is accepted as well, the legs then have one value
+per barrier scenario.
+
+    sma.get_proba()
+    solver = SnowballCoupon(sma, notional=100)
+    coupon = solver.fair_coupon()                          # price == 0, dividend coupon == KO coupon
+    curve = solver.price_curve(np.linspace(0.05, 0.3, 26))
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+"""
+import numpy as np
+import pandas as pd
+from Auxiliary.Runtime import phase
+from MatrixExponential.SnowballBatch import SnowballBatch
+
+
+class SnowballCoupon:
+
+    def __init__(self, sma, notional=1, discount=None):
+        """ sma: 已运行 get_proba 的 SnowballMatrixApproximation / SnowballBatch
+            discount: None 时使用 sma.r；数值为连续复利贴现率；可调用对象为贴现因子 D(T) """
+        if sma.out_proba is None:
+            raise ValueError("请先运行 get_proba")
+        self.sma = sma
+        self.notional = notional
+        self.discount = discount
+        self.out_leg = None
+        self.dnt_leg = None
+        self.in_leg = None
+        self._set_legs()
+
+    def discount_factor(self, time):
+        time = np.asarray(time, dtype=float)
+        if callable(self.discount):
+            return np.asarray(self.discount(time), dtype=float)
+        rate = self.sma.r if self.discount is None else self.discount
+        return np.exp(-rate * time)
+
+    @phase('pricing')
+    def _set_legs(self):
+        """ 单位票息、单位名义本金的各部分价值（与 Snowball.get_price 相同的计算） """
+        sma = self.sma
+        out_observe_day = sma.out_observe_day
+        discount = self.discount_factor(out_observe_day)
+        incre_out_proba = np.array(list(sma.incre_out_proba.values()))   # (敲出观察日[, 情景])
+        adj_incre_out_proba = incre_out_proba / incre_out_proba.sum(axis=0) * sma.out_proba
+        ki = sma._block(sma.KI) if isinstance(sma, SnowballBatch) else sma.KI.u0
+        in_payoff = np.where(sma.xvec < sma.x0, (sma.xvec - sma.x0) / sma.x0, 0)
+        self.out_leg = (discount * out_observe_day) @ adj_incre_out_proba
+        self.dnt_leg = discount[-1] * sma.dnt_proba * sma.t
+        self.in_leg = discount[-1] * sma.quadrature.integrate(in_payoff * ki, method='simps')
+
+    def price(self, out_coupon, dividend_coupon=None):
+        """ 任意票息（可为数组，按 numpy 规则与情景广播）的价格，dividend_coupon 默认等于 out_coupon """
+        out_coupon = np.asarray(out_coupon, dtype=float)
+        dividend_coupon = out_coupon if dividend_coupon is None else np.asarray(dividend_coupon, dtype=float)
+        out_price = self.out_leg * out_coupon * self.notional
+        dnt_price = self.dnt_leg * dividend_coupon * self.notional
+        in_price = np.broadcast_to(self.in_leg * self.notional, np.broadcast(out_price, dnt_price).shape)
+        return {'price': out_price + dnt_price + in_price, 'out_price': out_price, 'in_price': in_price,
+                'dnt_price': dnt_price}
+
+    def price_curve(self, coupons, dividend_coupon=None):
+        """ 一组敲出票息对应的价格曲线，SnowballBatch 时每个 (情景, 票息) 一行 """
+        coupons = np.atleast_1d(np.asarray(coupons, dtype=float))
+        dividend = coupons if dividend_coupon is None else np.broadcast_to(dividend_coupon, coupons.shape)
+        scenarios = np.atleast_1d(self.out_leg).shape[0]
+        prices = self.price(coupons[:, np.newaxis], dividend[:, np.newaxis]) if scenarios > 1 else \
+            self.price(coupons, dividend)
+        curve = {'out_coupon': np.repeat(coupons, scenarios), 'dividend_coupon': np.repeat(dividend, scenarios)}
+        if scenarios > 1:
+            curve['scenario'] = np.tile(np.arange(scenarios), coupons.shape[0])
+        curve.update({name: np.ravel(value) for name, value in prices.items()})
+        return pd.DataFrame(curve)
+
+    def fair_coupon(self, target=0, dividend_coupon=None):
+        """ 使价格等于 target（与 price 同单位，默认 0 即平价）的敲出票息
+            dividend_coupon 为 None 时红利票息与敲出票息相同，否则固定为给定值 """
+        value = np.asarray(target, dtype=float) / self.notional - self.in_leg
+        if dividend_coupon is None:
+            return value / (self.out_leg + self.dnt_leg)
+        return (value - self.dnt_leg * np.asarray(dividend_coupon, dtype=float)) / self.out_leg
+
+    def fair_dividend_coupon(self, out_coupon, target=0):
+        """ 给定敲出票息时，使价格等于 target 的红利票息 """
+        value = np.asarray(target, dtype=float) / self.notional - self.in_leg
+        return (value - self.out_leg * np.asarray(out_coupon, dtype=float)) / self.dnt_leg
+
+
+if __name__ == '__main__':
+    from MatrixExponential.SnowballMatrixApproximation import SnowballMatrixApproximation, Snowball
+    r, vol, Nx, Nt, x0, t, up, down, notional = 0.03, 0.13, 200, 330, 100, 1, 1.03, 0.85, 100
+    sma = SnowballMatrixApproximation(r=r, vol=vol, Nx=Nx, t=t, x0=x0, up=up, down=down, Nt=Nt,
+                                      integrate_method='inner_product', is_changed_grid=True, is_uniform=False,
+                                      is_simplify=False, retain='none')
+    sma.get_proba()
+    solver = SnowballCoupon(sma, notional=notional)
+    coupon = solver.fair_coupon()
+    print(f'平价敲出票息（红利票息相同）: {coupon:.6f}')
+    print(f'红利票息固定为 0.1 时的平价敲出票息: {solver.fair_coupon(dividend_coupon=0.1):.6f}')
+    *_, total_price = Snowball(r, coupon, coupon, notional, sma).get_price()
+    print(f'平价票息的定价（应为 0）: {total_price:.3e}')
+    print(solver.price_curve(np.linspace(0.05, 0.30, 6)))
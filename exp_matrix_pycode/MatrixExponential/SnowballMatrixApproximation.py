@@ -34,6 +34,71 @@ Version History:
 1.0.4 - 2023-11-29
     - Adjust the order of the solution, transfer the probability first, and then interpolate.
       Reduce code coupling.
+1.0.5 - 2026-10-18
+    - Cache the eigen decomposition and the block matrix in a bounded LRU cache keyed by the
+      operator fingerprint (xvec, r, vol, is_simplify, num_eigenvalue).
+1.0.6 - 2026-10-18
+    - Factor the residual block system once per grid (CoefficientProjector) and solve the
+      coefficients of all PDFs with one multi right-hand side solve per day.
+1.0.7 - 2026-10-18
+    - Add `eigen_method='tridiagonal'`, which symmetrizes the tridiagonal operator with a diagonal
+      similarity transform and uses a real symmetric tridiagonal eigen solver.
+1.0.8 - 2026-10-18
+    - Add `propagator='krylov'`, which evolves the stacked PDFs with expm_multiply on the sparse
+      operator instead of the eigen subspace.
+1.0.9 - 2026-10-18
+    - Add `propagator='crank_nicolson'` (FiniteDifference.CrankNicolson), an O(Nx) banded implicit
+      stepper with Rannacher start-up after each transfer. `propagator_options` is passed to the stepper.
+1.0.10 - 2026-10-18
+    - Cache dense propagators P(dt) = V exp(Λ dt) V^+ per (grid, dt) under a memory cap, so each
+      eigen step is one GEMM over the stacked PDFs. By default it is only used on a fixed grid, where
+      every P(dt) is reused across all months.
+1.0.11 - 2026-10-18
+    - Hold OUT / KI / DNT in one stacked DensityState. PDF.u0 is a row view, propagation is one matrix
+      product per step and the transfers are vectorized on the stacked array.
+1.0.12 - 2026-10-18
+    - Integrate with precomputed quadrature weights (Auxiliary.Quadrature) built once per grid. Region
+      integrals of the stacked PDFs are dot products.
+1.0.13 - 2026-10-18
+    - Store the intermediate PDFs in preallocated arrays (ResultStore) controlled by
+      `retain='none' | 'observation_days' | 'all'`. The PDF dicts and xvec_dict / dx_dict are read-only
+      views built from the store, and the interpolation DataFrames are only built when retain='all'.
+1.0.14 - 2026-10-18
+    - Replace prints, mass-conservation asserts and debug DataFrames in the stepping loop with events
+      (Auxiliary.Observer). Attach LoggingSubscriber / MassConservationChecker / DataFrameCapture via
+      `observers` to get the diagnostics back.
+1.0.15 - 2026-10-18
+    - Profile the phases of a run (grid, operator, eigendecomposition, coefficient_solve, propagation,
+      transfer, interpolation, integration, pricing) with Auxiliary.Runtime.PROFILER. Switched on by
+      SNOWBALL_PROFILE or `with profiling(path)`.
+1.0.16 - 2026-10-18
+    - Add `grid`: a fixed x vector used on every day instead of the lognormal quantile grid, so that
+      bumped scenarios (SnowballGreeks) share one grid and one operator.
+1.0.17 - 2026-10-18
+    - Add `restrict_domain`: between two knock-out observation days KI and DNT evolve on their own
+      sub-grids (KI below the up barrier plus the diffusion of one month, DNT above the down barrier
+      plus the diffusion of one step) with the principal sub-matrix of the operator, i.e. an
+      absorbing boundary where the density is negligible. Each sub-operator has its own cached
+      decomposition (or stepper). Only with the full spectrum (num_eigenvalue None or >= Nx), a
+      truncated spectrum raises ValueError.
+1.0.18 - 2026-10-18
+    - Add `remap='conservative'`: on a grid change all stacked PDFs are remapped with one sparse,
+      mass-conserving and positivity-preserving matrix (Auxiliary.Remap) instead of one spline per
+      PDF followed by clipping and renormalization. The matrices are cached per grid pair in
+      REMAP_CACHE and shared across contracts.
+1.0.19 - 2026-10-18
+    - Add `schedule`: a precomputed GridSchedule (grids, quadrature weights, barrier indices, operators,
+      remap matrices and optionally the eigen decompositions) that replaces the per-day grid setup.
+1.0.20 - 2026-10-18
+    - Remove `_get_matrix`, the unused dense 2N block system kept for verification.
+1.0.21 - 2026-10-18
+    - Renormalize the interpolated PDFs with `_rescale_mass`: a PDF without mass before the grid change
+      (e.g. KI before the first knock-in) stays zero instead of 0/0, a PDF that loses all of its mass
+      in the interpolation raises AssertionError as the removed mass-conservation assert did.
+1.0.22 - 2026-10-18
+    - `restrict_domain` only pays off with `propagator='crank_nicolson'`. With eigen / krylov every sub-grid
+      needs its own decomposition, so a sub-grid covering more than DOMAIN_MAX_FRACTION of the grid falls
+      back to the (cached) operator of the whole grid; these propagators are not faster with the option.
 """
 import numpy as np
 import pandas as pd
@@ -44,8 +109,25 @@ import scipy.interpolate as spi
 from scipy.stats import lognorm
 from Auxiliary.NonUniformGrid import generate_custom_grid
 from AnalyticalMethod.SnowballFokkerPlank import SnowballDiscrete
+from Auxiliary.Cache import LRUCache, fingerprint
+from Auxiliary.Quadrature import Quadrature
+from Auxiliary.Remap import remap_matrix
+from Auxiliary.Observer import EventBus
+from Auxiliary.Runtime import PROFILER, phase
+from MatrixExponential.CoefficientProjection import CoefficientProjector
+from MatrixExponential.TridiagonalEigen import SymmetricTridiagonalDecomposition
+from MatrixExponential.KrylovPropagator import KrylovPropagator
+from MatrixExponential.DensityState import DensityState
+from MatrixExponential.ResultStore import ResultStore, STAGES
+from FiniteDifference.CrankNicolson import CrankNicolsonPropagator
 import json
 
+EIGEN_CACHE = LRUCache(maxsize=32)  # 特征分解缓存，跨合约共享：key -> (values, vectors, projector)
+PROPAGATOR_CACHE = LRUCache(maxsize=256, max_bytes=256 * 2 ** 20)  # 传播矩阵缓存：(key, dt) -> P(dt)
+REMAP_CACHE = LRUCache(maxsize=256, max_bytes=64 * 2 ** 20)  # 重映射矩阵缓存：(旧网格, 新网格) -> R
+# eigen / krylov 演化时子区间超过网格点的该比例则使用整个网格的算子（子区间的分解比缩小矩阵节省的更多）
+DOMAIN_MAX_FRACTION = 0.5
+
 class PDF:
     """ 实现 Knock-out, Knock-in, Double no touch
         以 Knock-out 为例，说明某一天的质量是如何转化的
@@ -77,25 +159,41 @@ class PDF:
           |       ***    ***
           |--------------------------------
     """
-    def __init__(self, name):
+    def __init__(self, name, state=None):
         self.name = name       # 名称
         self.tck = None        # 插值的样条对象
         self.last_xvec = None  # 插值之前的 x vector (truncated)
-        self.u0 = None         # 当前的 PMF
-        self.after_interpolation = {}    # 储存归一化后的求解结果 (PMF)，注意与 Debug 组件中的属性区分
-                                         # 后续会对其优化
-
-        # ---------------- Debug 组件 ---------------- #
-        self.before_interpolate = {}     # 储存插值前的信息
-        self.after_interpolate = {}      # 储存插值后的信息
-        # ---------------- Debug 使用 ---------------- #
-
-        self.before_transfer = {}        # 储存概率转移前的 PMF
-        self.after_transfer = {}         # 储存概率转移后的 PMF
-        self.b = None                    # 矩阵求解时的列向量（已知） Ax = b
+        self.state = state     # 所属的 DensityState，u0 为其中一行的视图
+        self._u0 = None        # 不属于任何 DensityState 时的 PMF
+        self.results = None    # 所属的 ResultStore，储存各阶段的 PMF
         self.last_time = None            # 迭代求解的上一个时间
-        self.coefficient = None          # 特征向量对应的系数 c
-        self.result_coefficient = None   # c * exp(\lambda * t)
+
+    @property
+    def before_transfer(self):
+        """ 储存概率转移前的 PMF {time: PMF} """
+        return {} if self.results is None else self.results.as_dict('before_transfer', self.name)
+
+    @property
+    def after_transfer(self):
+        """ 储存概率转移后的 PMF {time: PMF} """
+        return {} if self.results is None else self.results.as_dict('after_transfer', self.name)
+
+    @property
+    def after_interpolation(self):
+        """ 储存归一化后的求解结果 (PMF)，注意与 Debug 组件中的属性区分 """
+        return {} if self.results is None else self.results.as_dict('after_interpolation', self.name)
+
+    @property
+    def u0(self):
+        """ 当前的 PMF """
+        return self._u0 if self.state is None else self.state[self.name]
+
+    @u0.setter
+    def u0(self, value):
+        if self.state is None:
+            self._u0 = value
+        else:
+            self.state[self.name] = value
 
     def xvec_pdf(self, xvec, min_idx, max_idx):
         if self.name == 'OUT':
@@ -111,16 +209,30 @@ class PDF:
 class SnowballMatrixApproximation(SnowballDiscrete):
 
     def __init__(self, r, vol, Nx, t, x0, up, down, Nt, integrate_method, num_eigenvalue=None,
-                 is_changed_grid=False, is_uniform=True, is_simplify=True):
+                 is_changed_grid=False, is_uniform=True, is_simplify=True, eigen_cache=None,
+                 eigen_method='general', propagator='eigen', propagator_options=None, cache_propagator=None,
+                 propagator_cache=None, retain='all', observers=None, grid=None, restrict_domain=False,
+                 domain_width=8.0, remap='spline', remap_cache=None, schedule=None):
         super().__init__(r, vol, Nx, t, x0, up, down)
-        self.OUT = PDF('OUT')
-        self.KI = PDF('KI')
-        self.DNT = PDF('DNT')
+        self.state = DensityState(['OUT', 'KI', 'DNT'])  # 所有 PDF 储存在一个 (3, N) 的数组中
+        self.OUT = PDF('OUT', self.state)
+        self.KI = PDF('KI', self.state)
+        self.DNT = PDF('DNT', self.state)
         self.integrate_method = integrate_method
         self.number_of_eigenvalue = int(self.Nx+1) if num_eigenvalue is None else int(num_eigenvalue)
         self.is_changed_grid = is_changed_grid
         self.is_uniform = is_uniform
         self.is_simplify = is_simplify
+        if eigen_method not in ('general', 'tridiagonal'):
+            raise ValueError(f"Unknown eigen_method: {eigen_method}")
+        self.eigen_method = eigen_method  # 'general': scl.eig / eigs, 'tridiagonal': 实对称三对角分解
+        if propagator not in ('eigen', 'krylov', 'crank_nicolson'):
+            raise ValueError(f"Unknown propagator: {propagator}")
+        # 'eigen': 特征子空间演化, 'krylov': 稀疏 expm_multiply, 'crank_nicolson': 三对角隐式差分
+        self.propagator = propagator
+        self.propagator_options = {} if propagator_options is None else propagator_options
+        self.stepper = None               # 非特征子空间演化时使用的求解器，提供 propagate(u, dt)
+        self.values = self.vectors = self.projector = None  # 整个网格算子的特征分解
         self.pdf_list = [self.OUT, self.KI, self.DNT]
         # self.pdf_list = [self.OUT, self.DNT]
 
@@ -132,8 +244,12 @@ class SnowballMatrixApproximation(SnowballDiscrete):
 
         # PDF.before_transfer, PDF.after_transfer 使用索引 [0, 0, 1, 2,..., n-1] 调取x-vector和dx-vector
         # PDF.after_interpolation 使用索引 [0, 1, 2, 3,..., n] 调取x-vector和dx-vector
-        self.xvec_dict = {}             # 储存每个网格的spatial space
-        self.dx_dict = {}               # 储存每个网格的spatial step
+        self.retain = retain
+        self.results = ResultStore(retain, self.tvec, self.out_observe_day, self.state.names, self.Nx + 1)
+        for pdf in self.pdf_list:
+            pdf.results = self.results
+        # 事件接口：没有订阅者时不产生额外开销，诊断信息通过 Auxiliary.Observer 中的订阅者获取
+        self.events = EventBus(observers)
 
         self.out_proba = None           # 储存敲出概率
         self.in_proba = None            # 储存敲入概率
@@ -143,6 +259,43 @@ class SnowballMatrixApproximation(SnowballDiscrete):
         self.error = 1e-15              # 截断的概率
 
         self.dense_range = self.x0 * 0.05
+        self.eigen_cache = EIGEN_CACHE if eigen_cache is None else eigen_cache  # 传入 LRUCache(maxsize=0) 可关闭缓存
+        # 特征子空间演化时是否使用稠密传播矩阵 P(dt)。构建 P 的代价为 O(N^3)，默认只在网格固定
+        # （P 可在各月之间复用）时使用；同一网格序列的多个合约定价时也可手动开启
+        self.cache_propagator = (not is_changed_grid) if cache_propagator is None else cache_propagator
+        self.propagator_cache = PROPAGATOR_CACHE if propagator_cache is None else propagator_cache
+        self.operator_key = None                  # 当前网格算子的指纹
+        self.grid = None if grid is None else np.asarray(grid, dtype=float)  # 固定网格，传入时每天都使用该 x vector
+        # KI / DNT 是否在各自的子区间上演化；domain_width 为子区间在障碍价位之外延伸的标准差个数。
+        # 只对 crank_nicolson 有加速，eigen / krylov 只使用不超过 DOMAIN_MAX_FRACTION 的子区间
+        if restrict_domain and propagator == 'eigen' and self.number_of_eigenvalue < self.Nx:
+            # 子区间算子截断后的特征向量不能表示截断的 KI / DNT 密度，价格偏差很大
+            raise ValueError("restrict_domain 只能与完整的特征值（num_eigenvalue 为 None 或 >= Nx）一起使用")
+        self.restrict_domain = restrict_domain
+        self.domain_width = domain_width
+        self.domains = {}                         # PDF 名称 -> 当前的求解区间 (lo, hi)
+        self.operators = {}                       # 求解区间 (lo, hi) -> 子区间算子，每次分解后重建
+        if remap not in ('spline', 'conservative'):
+            raise ValueError(f"Unknown remap: {remap}")
+        # 更换网格时的插值方法，'spline': 每个 PDF 三次样条插值后归一化，'conservative': 守恒的稀疏重映射矩阵
+        self.remap = remap
+        self.remap_cache = REMAP_CACHE if remap_cache is None else remap_cache
+        # 预计算的网格序列（MatrixExponential.GridSchedule），传入时网格、算子与重映射矩阵直接从中读取
+        self.schedule = schedule
+        self.grid_index = None                    # 当前网格在 schedule 中的编号
+        if schedule is not None:
+            schedule.check(r=r, vol=vol, t=t, x0=x0, up=up, down=down, Nx=Nx, Nt=Nt, is_uniform=is_uniform,
+                           is_simplify=is_simplify, is_changed_grid=is_changed_grid)
+
+    @property
+    def xvec_dict(self):
+        """ 储存每个网格的spatial space {time: xvec} """
+        return self.results.grid_dict('xvec')
+
+    @property
+    def dx_dict(self):
+        """ 储存每个网格的spatial step {time: dx} """
+        return self.results.grid_dict('dx')
 
     @staticmethod
     def index_of_first(arr, _max, _min):
@@ -152,13 +305,6 @@ class SnowballMatrixApproximation(SnowballDiscrete):
         max_index = max_index if max_index<arr.size else -1
         return min_index, max_index
 
-    @staticmethod
-    def get_data(idx, col, ut, dx):
-        df = pd.DataFrame(index=idx)
-        df[col] = ut
-        df['dx'] = dx
-        return df
-
     @staticmethod
     def integrate(pdf, xvec, dx, method):
         if method == 'inner_product':
@@ -173,13 +319,24 @@ class SnowballMatrixApproximation(SnowballDiscrete):
             proba, _ = sci.quad(f, xvec[0], xvec[-1])
         return proba
 
+    @phase('grid')
     def _set_grid(self, _time):
         """ 初始化（更新） GBM 的解域 """
+        if self.schedule is not None:
+            self.grid_index = self.schedule.index(_time)
+            self.xvec, self.total_dx, self.min_idx, self.max_idx = self.schedule.grid(self.grid_index)
+            self.x_min, self.x_max = self.xvec[0], self.xvec[-1]
+            self._dx = np.diff(self.xvec)
+            self.quadrature = self.schedule.quadrature(self.grid_index, self.integrate_method)
+            return
         s = self.vol * np.sqrt(_time)                                      # 标准差参数
         scale = np.exp((self.r - 0.5 * self.vol ** 2) * self.t) * self.x0  # 缩放参数
         self.x_min = lognorm.ppf(self.error, s, scale=scale)
         self.x_max = lognorm.ppf(1-self.error, s, scale=scale)
-        if self.is_uniform:
+        if self.grid is not None:
+            self.xvec = self.grid
+            self.x_min, self.x_max = self.xvec[0], self.xvec[-1]
+        elif self.is_uniform:
             self.xvec = np.linspace(self.x_min, self.x_max, self.Nx + 1)
         else:
             self.xvec = generate_custom_grid(self.x_min, self.x_max, self.down, self.up, self.Nx+1,
@@ -190,83 +347,114 @@ class SnowballMatrixApproximation(SnowballDiscrete):
         self.total_dx[-1] = self._dx[-1] / 2
         self.total_dx[1:-1] = (self._dx[:-1] + self._dx[1:]) / 2
         self.min_idx, self.max_idx = self.index_of_first(self.xvec, self.up, self.down)
+        self.quadrature = Quadrature(self.xvec, self.total_dx, self.integrate_method)  # 当前网格的积分权重
 
     def _initialize_conditions(self, _time):
         # ---------------#
         # Step1. 初始化
         # ---------------#
         self._set_grid(_time)
+        self.state.resize(self.xvec.shape[0])
         self.OUT.u0 = self.analytical(_time)
         self.KI.u0 = self.OUT.u0.copy()
         self.DNT.u0 = self.OUT.u0.copy()
         # ---------------------------- #
         # Step2. 转移概率（首日无需转移）
         # ---------------------------- #
-        self.incre_out_proba[_time] = self.integrate(self.OUT.u0[self.max_idx:], self.xvec[self.max_idx:],
-                                                     self.total_dx[self.max_idx:], self.integrate_method)  # 增量敲出概率
-        print(f"{round(_time, 2)}: 增量敲出概率为{self.incre_out_proba[_time]}")
+        self.incre_out_proba[_time] = self.quadrature.integrate(self.OUT.u0, start=self.max_idx)  # 增量敲出概率
         self.KI.u0[self.min_idx + 1:] = 0   # KI Non-Knock-in --> 0
         self.OUT.u0[:self.max_idx] = 0      # OUT Non-Knock-Out --> 0
         self.DNT.u0[self.max_idx:] = 0      # DNT Knock-out --> 0
         self.DNT.u0[:self.min_idx + 1] = 0  # DNT Knock-in --> 0
         # self._normalize_results(_time)
         self._store_results(_time, 'before_transfer', 'after_transfer')
+        if 'transferred' in self.events:
+            self.events.emit('transferred', time=_time, kind='knock_out', incre_out_proba=self.incre_out_proba[_time])
 
-
+    @phase('interpolation')
     def _handle_grid_change(self, _time):
-        # ------------------------------------------------------- #
-        # Step1. 记录插值前的信息，可通过取消 `Debug 组件` 的注释进行
-        # ------------------------------------------------------- #
-        for pdf in self.pdf_list:
-            # Debug 组件
-            proba = self.integrate(pdf.u0, self.xvec, self.total_dx, self.integrate_method)
-            temp = self.get_data(self.xvec, 'before_interp', pdf.u0, self.total_dx)
-            pdf.before_interpolate[_time] = (proba, temp)
-
-            pdf.tck = spi.splrep(*pdf.xvec_pdf(self.xvec, self.min_idx, self.max_idx), k=3)
-        self._set_grid(_time)
-        # --------------------------- #
-        # Step2. 插值更新网格的初始条件
-        # --------------------------- #
-        for pdf in self.pdf_list:
-            pdf.u0 = np.zeros(shape=self.xvec.shape)
-            within_range = (self.xvec >= pdf.last_xvec.min()) & (self.xvec <= pdf.last_xvec.max())
-            pdf.u0[within_range] = spi.splev(self.xvec[within_range], pdf.tck)
-            pdf.u0[pdf.u0 < 0] = 0  # 插值时有可能插出负数，将负数替换为0 （稳健操作）
-            proba = self.integrate(pdf.u0, self.xvec, self.total_dx, self.integrate_method)
-            pdf.u0 = pdf.u0 / proba * pdf.before_interpolate[_time][0]  # Normalize
-            # Debug 组件
-            proba = self.integrate(pdf.u0, self.xvec, self.total_dx, self.integrate_method)
-            assert np.allclose(proba, pdf.before_interpolate[_time][0]), f"{pdf.name} 插值前后的质量不相等"
-            temp = self.get_data(self.xvec, 'after_interp', pdf.u0, self.total_dx)
-            pdf.after_interpolate[_time] = (proba, temp)
+        # ------------------------------------------------------------------ #
+        # Step1. 记录插值前的信息，订阅 `grid_changed` 事件可获取插值前后的 PMF
+        # ------------------------------------------------------------------ #
+        observed = 'grid_changed' in self.events
+        rows = self.state.rows([pdf.name for pdf in self.pdf_list])
+        if observed:
+            old_xvec, old_dx, old_u = self.xvec, self.total_dx, self.state.data[rows].copy()
+        names = [pdf.name for pdf in self.pdf_list]
+        if self.remap == 'conservative':
+            # 守恒重映射：质量守恒且非负，一次稀疏乘法完成所有 PDF，无需归一化
+            if observed:
+                proba_before = dict(zip(names, self.quadrature.integrate(self.state.data[rows])))
+            last_xvec, last_index = self.xvec, self.grid_index
+            self._set_grid(_time)
+            R = self._get_remap(last_xvec, self.xvec) if self.schedule is None else self.schedule.remap(last_index)
+            u = self.state.data[rows] @ R.T
+            self.state.resize(self.xvec.shape[0])
+            self.state.data[rows] = u
+        else:
+            proba_before = {}
+            for pdf in self.pdf_list:
+                proba_before[pdf.name] = self.quadrature.integrate(pdf.u0)
+                pdf.tck = spi.splrep(*pdf.xvec_pdf(self.xvec, self.min_idx, self.max_idx), k=3)
+            self._set_grid(_time)
+            self.state.resize(self.xvec.shape[0])
+            # --------------------------- #
+            # Step2. 插值更新网格的初始条件
+            # --------------------------- #
+            for pdf in self.pdf_list:
+                within_range = (self.xvec >= pdf.last_xvec.min()) & (self.xvec <= pdf.last_xvec.max())
+                pdf.u0[within_range] = spi.splev(self.xvec[within_range], pdf.tck)
+                pdf.u0[pdf.u0 < 0] = 0  # 插值时有可能插出负数，将负数替换为0 （稳健操作）
+                pdf.u0 = self._rescale_mass(pdf.u0, proba_before[pdf.name], pdf.name)  # Normalize
+        if observed:
+            self.events.emit('grid_changed', time=_time, names=names,
+                             proba_before=[proba_before[name] for name in names],
+                             proba_after=self.quadrature.integrate(self.state.data[rows]),
+                             old_xvec=old_xvec, old_dx=old_dx, old_u=old_u,
+                             xvec=self.xvec, dx=self.total_dx, u=self.state.data[rows])
+
+    def _rescale_mass(self, u, proba_before, names):
+        """ 插值后的 PDF u（单个向量或按行堆叠）按插值前的质量 proba_before 归一化（原地修改）。
+            插值前没有质量的行保持为 0；插值前有质量、插值后质量为 0 时质量不守恒，抛出 AssertionError """
+        proba_before = np.asarray(proba_before, dtype=float)
+        proba = np.asarray(self.quadrature.integrate(u), dtype=float)
+        lost = (proba_before > 0) & (proba <= 0)
+        if np.any(lost):
+            lost_names = np.broadcast_to(np.asarray(names), lost.shape)[lost]
+            raise AssertionError(f"{', '.join(np.unique(lost_names))} 插值前后的质量不相等")
+        empty = proba_before == 0
+        u /= np.where(empty, 1, proba)[..., np.newaxis]
+        u *= np.where(empty, 0, proba_before)[..., np.newaxis]
+        return u
+
+    def _get_remap(self, last_xvec, xvec):
+        """ 由 last_xvec 到 xvec 的重映射矩阵，按网格对缓存 """
+        key = (fingerprint(last_xvec), fingerprint(xvec))
+        R = self.remap_cache.get(key)
+        if R is None:
+            R = remap_matrix(last_xvec, xvec)
+            self.remap_cache.put(key, R)
+        return R
 
     def _update_conditions_for_subsequent_days(self, _time):
         # ---------------------- #
         # Step1. 求解当日的 PMF
         # ---------------------- #
-        for pdf in self.pdf_list:
-            self._get_coefficient(pdf)
-            self._get_ut(pdf, _time)
+        self._propagate(self.pdf_list, _time)
         # self._normalize_results(_time)
         self._store_results(_time, 'before_transfer')
         # --------------- #
         # Step2. 转移概率
         # --------------- #
-        out1 = self.integrate(self.DNT.u0[self.max_idx:], self.xvec[self.max_idx:],
-                              self.total_dx[self.max_idx:], self.integrate_method)
-        out2 = self.integrate(self.KI.u0[self.max_idx:], self.xvec[self.max_idx:],
-                              self.total_dx[self.max_idx:], self.integrate_method)
-        self.incre_out_proba[_time] = out1 + out2
-        print(f"{round(_time, 2)}: 增量敲出概率为{self.incre_out_proba[_time]}")
-        self.KI.u0[:self.min_idx + 1] += self.DNT.u0[:self.min_idx + 1]  # DNT Knock-in --> KI Knock-in
-        self.OUT.u0[self.max_idx:] += self.DNT.u0[self.max_idx:]         # DNT Knock-out --> OUT Knock-out
-        self.OUT.u0[self.max_idx:] += self.KI.u0[self.max_idx:]          # KI Knock-out --> OUT Knock-out
-        self.KI.u0[self.max_idx:] = 0       # KI Knock-out --> 0
-        self.DNT.u0[self.max_idx:] = 0      # DNT Knock-out --> 0
-        self.DNT.u0[:self.min_idx + 1] = 0  # DNT Knock-in --> 0
+        with PROFILER.phase('transfer'):
+            out_rows = self.state.rows(['KI', 'DNT'])
+            self.incre_out_proba[_time] = self.quadrature.integrate(self.state.data[out_rows], start=self.max_idx).sum()
+            self.state.knock_in(self.min_idx)   # DNT Knock-in --> KI Knock-in, DNT Knock-in --> 0
+            self.state.knock_out(self.max_idx)  # DNT, KI Knock-out --> OUT Knock-out, DNT, KI Knock-out --> 0
         # self._normalize_results(_time)
         self._store_results(_time, 'after_transfer')
+        if 'transferred' in self.events:
+            self.events.emit('transferred', time=_time, kind='knock_out', incre_out_proba=self.incre_out_proba[_time])
         # ----------------------------- #
         # Step3. 若更换网格，进行插值处理
         # ----------------------------- #
@@ -275,20 +463,17 @@ class SnowballMatrixApproximation(SnowballDiscrete):
 
     def _normalize_results(self, _time):
         """ 归一化 """
-        numerical_proba = sum([self.integrate(pdf.u0, self.xvec, self.total_dx, self.integrate_method)
-                               for pdf in self.pdf_list])
+        rows = self.state.rows([pdf.name for pdf in self.pdf_list])
+        numerical_proba = self.quadrature.integrate(self.state.data[rows]).sum()
         analytical_proba = 1 - 2 * self.error
-        for pdf in self.pdf_list:
-            pdf.u0 = pdf.u0 / numerical_proba * analytical_proba
+        self.state.data[rows] *= analytical_proba / numerical_proba
 
-    def _store_results(self, _time, *args):
-        """ 储存归一化后的结果 """
-        for pdf in self.pdf_list:
-            for arg in args:
-                if hasattr(pdf, arg) and isinstance(getattr(pdf, arg), dict):
-                    target_dict = getattr(pdf, arg)
-                    target_element = getattr(pdf, 'u0')
-                    target_dict[_time] = target_element.copy()
+    def _store_results(self, _time, *args, pdfs=None):
+        """ 储存归一化后的结果，写入 ResultStore 的预分配数组 """
+        rows = [self.state.index[pdf.name] for pdf in (self.pdf_list if pdfs is None else pdfs)]
+        for arg in args:
+            if arg in STAGES:
+                self.results.record(arg, _time, self.state.data, rows)
 
     def _set_initial_condition(self, _time):
         """ 只有时间处在 `敲出观察日` 中时，该函数才被执行。"""
@@ -298,61 +483,169 @@ class SnowballMatrixApproximation(SnowballDiscrete):
             self._update_conditions_for_subsequent_days(_time)
         self._normalize_results(_time)
         self._store_results(_time, 'after_interpolation')
-        self.xvec_dict[_time] = self.xvec
-        self.dx_dict[_time] = self.total_dx
-
-    def _eigen_value_vector(self):
-        """ 计算绝对值最小的部分特征值 """
-        if self.number_of_eigenvalue in [self.Nx, self.Nx+1]:
-            self.values, self.vectors = scl.eig(self.A.toarray())
+        self.results.record_grid(_time, self.xvec, self.total_dx)
+        if 'observation_completed' in self.events:
+            self.events.emit('observation_completed', time=_time, incre_out_proba=self.incre_out_proba.get(_time))
+
+    @phase('eigendecomposition')
+    def _eigen_value_vector(self, A=None):
+        """ 计算绝对值最小的部分特征值，A 默认为整个网格的算子，返回 (values, vectors, projector) """
+        A = self.A if A is None else A
+        n = A.shape[0]
+        k = self.number_of_eigenvalue
+        full = self.number_of_eigenvalue in [self.Nx, self.Nx+1] or k >= n - 1
+        if self.eigen_method == 'tridiagonal':
+            projector = SymmetricTridiagonalDecomposition(A, None if full else k)
+            return projector.values, projector.vectors, projector
+        if full:
+            values, vectors = scl.eig(A.toarray())
         else:
-            self.values, self.vectors = sp.linalg.eigs(self.A, self.number_of_eigenvalue, which='SM')  # The absolute value is minimal
-
-    def _get_matrix(self):
-        """ 获取系数矩阵 """
-        V_block = self.vectors
-        I_block = np.eye(self.vectors.shape[0])
-        Zero_block = np.zeros((self.vectors.shape[1], self.vectors.shape[1]))
-        Vt_block = self.vectors.T
-        self.matrix = np.block([[V_block, I_block], [Zero_block, Vt_block]])
-
-    def _get_coefficient(self, pdf):
-        """ 求解特征向量对应的系数以及残差 """
-        pdf.b = np.array(list(pdf.u0) + [0] * self.vectors.shape[1])
-        pdf.coefficient = np.linalg.solve(self.matrix, pdf.b)
-
-    def _get_ut(self, pdf, _time):
-        pdf.result_coefficient = pdf.coefficient[:self.values.shape[0]] * np.exp(np.real(self.values) * (_time - pdf.last_time))
-        # 更新每个 PDF 的初始条件
-        pdf.u0 = np.real(np.sum(pdf.result_coefficient[:, np.newaxis] * self.vectors.T, axis=0))
-        if pdf.u0.min() < 0:
-            pdf.u0 += np.abs(pdf.u0.min())  # 求解时有可能会有负数，-1e-18左右
+            values, vectors = sp.linalg.eigs(A, k, which='SM')  # The absolute value is minimal
+        return values, vectors, CoefficientProjector(vectors)
+
+    @phase('coefficient_solve')
+    def _get_coefficient(self, u, operator=None):
+        """ 求解特征向量对应的系数，u 为按行堆叠的多个 PDF (m, N)，返回 (k, m) """
+        _, _, _, projector, _ = self._operator() if operator is None else operator
+        return projector.solve(u.T)
+
+    def _get_ut(self, coefficient, dt, operator=None):
+        """ 由系数 c 求解 dt 之后的 PDF：V (c * exp(\lambda * dt))，返回按行堆叠的 (m, N) """
+        _, values, vectors, _, _ = self._operator() if operator is None else operator
+        result_coefficient = coefficient * np.exp(np.real(values) * dt)[:, np.newaxis]
+        return np.real(vectors @ result_coefficient).T
+
+    def _get_propagator(self, dt, operator=None):
+        """ 稠密传播矩阵 P(dt) = V exp(Λ dt) V^+，按 (网格, dt) 缓存 """
+        operator_key, values, vectors, projector, _ = self._operator() if operator is None else operator
+        key = (operator_key, round(dt, 12))  # 消除 np.linspace 带来的浮点误差
+        P = self.propagator_cache.get(key)
+        if P is None:
+            projection = self.propagator_cache.get((operator_key, 'projection'))
+            if projection is None:  # 投影矩阵 V^+ 每个网格只计算一次
+                with PROFILER.phase('coefficient_solve'):
+                    projection = projector.projection_matrix()
+                self.propagator_cache.put((operator_key, 'projection'), projection)
+            P = np.real((vectors * np.exp(np.real(values) * dt)) @ projection)
+            P.flags.writeable = False
+            self.propagator_cache.put(key, P)
+        return P
+
+    @phase('propagation')
+    def _propagate(self, pdfs, _time):
+        """ 将多个 PDF 由各自的 last_time 演化至 _time，时间步长相同的 PDF 作为堆叠数组一次演化 """
+        groups = {}
+        for pdf in pdfs:
+            groups.setdefault((_time - pdf.last_time, self.domains.get(pdf.name)), []).append(pdf.name)
+        for (dt, domain), names in groups.items():
+            rows = self.state.rows(names)
+            cols = slice(None) if domain is None else slice(*domain)  # 子区间之外的密度为 0，不参与演化
+            operator = self._operator(domain)
+            u = self.state.data[rows, cols]
+            if self.propagator != 'eigen':
+                self.state.data[rows, cols] = operator[-1].propagate(u.T, dt).T
+            elif self.cache_propagator:
+                work = self.state.work[:u.shape[0], :u.shape[1]]
+                np.matmul(u, self._get_propagator(dt, operator).T, out=work)
+                self.state.data[rows, cols] = work
+            else:
+                self.state.data[rows, cols] = self._get_ut(self._get_coefficient(u, operator), dt, operator)
+            self.state.clip_negative(rows, cols)
 
     def _calculate_display_result(self):
-        self.out_proba = self.integrate(self.OUT.u0, self.xvec, self.total_dx, self.integrate_method)
-        self.in_proba = self.integrate(self.KI.u0, self.xvec, self.total_dx, self.integrate_method)
-        self.dnt_proba = self.integrate(self.DNT.u0, self.xvec, self.total_dx, self.integrate_method)
-        total_proba = self.out_proba + self.in_proba + self.dnt_proba
-        print(f"敲出的概率为：{self.out_proba}")
-        print(f"敲入的概率为：{self.in_proba}")
-        print(f"不敲出不敲入的概率为：{self.dnt_proba}")
-        print(f"总概率：{total_proba}")
+        self.out_proba, self.in_proba, self.dnt_proba = self.quadrature.integrate(
+            self.state.data[self.state.rows(['OUT', 'KI', 'DNT'])])
+        if 'probability_computed' in self.events:
+            self.events.emit('probability_computed', out_proba=self.out_proba, in_proba=self.in_proba,
+                             dnt_proba=self.dnt_proba)
+
+    def _decompose(self):
+        """ 构建算子并获取特征分解，相同网格与参数的分解直接从缓存中读取 """
+        with PROFILER.phase('operator'):
+            if self.schedule is not None:
+                self.A = self.schedule.operator(self.grid_index)
+            else:
+                self._set_matrix_simplify() if self.is_simplify else self._set_matrix()
+        self.operators = {}
+        if self.propagator != 'eigen':
+            self.stepper = self._get_stepper(self.A)
+            return
+        key = fingerprint(self.xvec, self.r, self.vol, self.is_simplify, self.number_of_eigenvalue,
+                          self.eigen_method)
+        self.operator_key = key
+        if self.schedule is not None and self.schedule.matches_eigen(self.number_of_eigenvalue, self.eigen_method):
+            self.values, self.vectors, self.projector = self.schedule.eigen(self.grid_index)
+            return
+        self.values, self.vectors, self.projector = self._get_eigen(key, self.A)
+
+    def _get_eigen(self, key, A):
+        entry = self.eigen_cache.get(key)
+        if entry is None:
+            entry = self._eigen_value_vector(A)
+            for arr in entry[:2]:
+                arr.flags.writeable = False  # 缓存共享，禁止原地修改
+            self.eigen_cache.put(key, entry)
+        return entry
+
+    def _get_stepper(self, A):
+        with PROFILER.phase('eigendecomposition'):  # 步进器的预处理（范数估计 / 分解）
+            stepper = KrylovPropagator if self.propagator == 'krylov' else CrankNicolsonPropagator
+            return stepper(A, **self.propagator_options)
+
+    def _operator(self, domain=None):
+        """ 求解区间上的算子 (key, values, vectors, projector, stepper)，domain 为 None 时为整个网格。
+            子区间 [lo, hi) 使用算子的主子矩阵（区间外的密度为 0，即吸收边界），分解按 (网格, 区间) 缓存 """
+        if domain is None:
+            return self.operator_key, self.values, self.vectors, self.projector, self.stepper
+        entry = self.operators.get(domain)
+        if entry is None:
+            lo, hi = domain
+            A = self.A[lo:hi, lo:hi]
+            if self.propagator != 'eigen':
+                entry = (None, None, None, None, self._get_stepper(A))
+            else:
+                key = fingerprint(self.operator_key, lo, hi)
+                entry = (key, *self._get_eigen(key, A), None)
+            self.operators[domain] = entry
+        return entry
+
+    def _set_domains(self, _time):
+        """ 到下一个敲出观察日之前 KI / DNT 的求解区间：
+            KI 在敲出观察日之后只位于敲出障碍之下，一个月内向上扩散；
+            DNT 每个时间步都会敲入，只位于敲入障碍之上，一个时间步内向下扩散 """
+        later = self.out_observe_day[self.out_observe_day > _time]
+        if not self.restrict_domain or later.size == 0:
+            self.domains = {}
+            return
+        n = self.xvec.shape[0]
+        steps = np.diff(self.tvec[(self.tvec >= _time) & (self.tvec <= later[0])])
+        drift = abs(self.r - 0.5 * self.vol ** 2)
+        spread = lambda dt: self.domain_width * self.vol * np.sqrt(dt) + drift * dt  # 对数价格的扩散范围
+        max_idx = np.asarray(self.max_idx)
+        if np.any(max_idx == -1):
+            hi = n
+        else:
+            x_hi = self.xvec[max_idx.max()] * np.exp(spread(later[0] - _time))
+            hi = min(np.searchsorted(self.xvec, x_hi, side='right') + 1, n)
+        x_lo = self.xvec[np.min(self.min_idx) + 1] * np.exp(-spread(steps.max()))
+        lo = max(np.searchsorted(self.xvec, x_lo, side='left') - 1, 0)
+        # 只有 crank_nicolson 的子区间步进器几乎没有额外开销，其余演化方式只保留足够小的子区间
+        max_size = n if self.propagator == 'crank_nicolson' else DOMAIN_MAX_FRACTION * n
+        self.domains = {name: domain for name, domain in (('KI', (0, hi)), ('DNT', (lo, n)))
+                        if domain != (0, n) and domain[1] - domain[0] <= max_size}
 
     def _handle_out_observe_day(self, _time):
         self._set_initial_condition(_time)
-        self._set_matrix_simplify() if self.is_simplify else self._set_matrix()
-        self._eigen_value_vector()
-        self._get_matrix()
+        self._decompose()
+        self._set_domains(_time)
         for pdf in self.pdf_list:
             pdf.last_time = _time
 
     def _handle_non_out_observe_day(self, _time):
-        self.xvec_dict[_time] = self.xvec
-        self.dx_dict[_time] = self.total_dx
+        self.results.record_grid(_time, self.xvec, self.total_dx)
+        self._propagate([self.KI, self.DNT], _time)  # 因为更换 u0，所以每次都需要重新演化，求解下一时刻的 u0，即 ut。
+        self._store_results(_time, 'before_transfer', pdfs=[self.KI, self.DNT])
         for pdf in [self.KI, self.DNT]:   # 解 2 个 PDF
-            self._get_coefficient(pdf)    # 因为更换 u0，所以每次都需要求解一下系数
-            self._get_ut(pdf, _time)      # 使用新的系数，求解下一时刻的 u0，即 ut。
-            pdf.before_transfer[_time] = pdf.u0.copy()
 
             # ------------------------- Whether preserve mass in knock-in observation day ------------------------- #
             # proba_before = self.integrate(pdf.ut_dict[pdf.last_time], self.xvec, self.total_dx, self.integrate_method)
@@ -363,12 +656,14 @@ class SnowballMatrixApproximation(SnowballDiscrete):
             # ------------------------- Whether preserve mass in knock-in observation day ------------------------- #
 
             pdf.last_time = _time  # 更新上一时刻时间点
-        self.KI.u0[:self.min_idx + 1] += self.DNT.u0[:self.min_idx + 1]  # DNT PDF Knock-in --> KI PDF Knock-in
-        self.DNT.u0[:self.min_idx + 1] = 0  # DNT PDF Knock-in --> 0
+        with PROFILER.phase('transfer'):
+            self.state.knock_in(self.min_idx)  # DNT PDF Knock-in --> KI PDF Knock-in, DNT PDF Knock-in --> 0
         self._store_results(_time, 'after_transfer')
+        if 'transferred' in self.events:
+            self.events.emit('transferred', time=_time, kind='knock_in')
         # self._normalize_results(_time)
-        self._store_results(_time, 'ut_dict')
 
+    @phase('probability')
     def get_proba(self):
         for _time in self.tvec:
             if _time in self.out_observe_day:  # 这是敲出观察日，只需要生成 self.pdf.u0 即可，迭代求解的起点。
@@ -398,6 +693,7 @@ class Snowball:
         self.sma = sma
         self.discount = np.exp(-self.r * self.sma.out_observe_day)
 
+    @phase('pricing')
     def get_price(self):
         self.adj_incre_out_proba = np.array(list(self.sma.incre_out_proba.values())) / \
                                    np.array(list(self.sma.incre_out_proba.values())).sum() * \
@@ -406,22 +702,27 @@ class Snowball:
         # 看每个敲出观察日价格
         self.out_price_process = self.discount * (self.adj_incre_out_proba * (self.sma.out_observe_day * self.out_coupon))
         self.dnt_price = self.discount[-1] * self.sma.dnt_proba * (self.sma.t*self.dividend_coupon)
-        self.in_price = [-(self.sma.x0-x)/self.sma.x0 if x<self.sma.x0 else 0 for x in self.sma.xvec]
-        self.in_price = (self.discount[-1] * self.sma.integrate(self.in_price*self.sma.KI.u0, self.sma.xvec,
-                                                                self.sma.total_dx, 'simps'))
+        self.in_price = np.where(self.sma.xvec < self.sma.x0, (self.sma.xvec - self.sma.x0) / self.sma.x0, 0)
+        self.in_price = self.discount[-1] * self.sma.quadrature.integrate(self.in_price * self.sma.KI.u0,
+                                                                          method='simps')
         self.total_price = sum(self.out_price_process) + self.in_price + self.dnt_price
         self.out_price_process *= self.notional
         self.in_price *= self.notional
         self.dnt_price *= self.notional
         self.total_price *= self.notional
-        print(f'*各月敲出部分的价值为：{self.out_price_process}')
-        print(f'@敲出部分的价值为：{sum(self.out_price_process)}')
-        print(f'@敲入部分的价值为：{self.in_price}')
-        print(f'@不敲出不敲入部分的价值为：{self.dnt_price}')
-        print(f'@雪球的价值为：{self.total_price}')
+        if 'priced' in self.sma.events:
+            self.sma.events.emit('priced', out_price_process=self.out_price_process,
+                                 out_price=sum(self.out_price_process), in_price=self.in_price,
+                                 dnt_price=self.dnt_price, total_price=self.total_price)
+        if PROFILER.enabled:  # 一次定价结束，按 SNOWBALL_PROFILE 写入报告
+            PROFILER.end_run(Nx=self.sma.Nx, Nt=len(self.sma.tvec), propagator=self.sma.propagator,
+                             eigen_method=self.sma.eigen_method, is_changed_grid=self.sma.is_changed_grid)
         return self.out_price_process, self.dnt_price, self.in_price, self.total_price
 
 if __name__ == '__main__':
+    import logging
+    from Auxiliary.Observer import LoggingSubscriber, MassConservationChecker
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     r = 0.03
     vol = 0.13
     Nx = 200
@@ -435,7 +736,9 @@ if __name__ == '__main__':
     notional = 100
     sma = SnowballMatrixApproximation(r=r, vol=vol, Nx=Nx, t=t, x0=x0, up=up, down=down, Nt=Nt,
                                       num_eigenvalue=None, integrate_method='inner_product',
-                                      is_changed_grid=True, is_uniform=False, is_simplify=False)
+                                      is_changed_grid=True, is_uniform=False, is_simplify=False,
+                                      retain='observation_days',
+                                      observers=[LoggingSubscriber(), MassConservationChecker()])
     sma.get_proba()
 
     visua_time = np.arange(30, sma.t * 360 + 30, 30) / 360
@@ -444,10 +747,10 @@ if __name__ == '__main__':
     for i, _time in enumerate(sma.out_observe_day):
         i = i if i == 0 else i - 1
         grid_time = sma.out_observe_day[i]
-        data = pd.DataFrame(index=sma.xvec_dict[grid_time])
+        data = pd.DataFrame(index=sma.results.xvec(grid_time))
         for pdf in sma.pdf_list:
-            data[f'{_time}_{pdf.name}_before_transfer'] = pdf.before_transfer[_time]
-            data[f'{_time}_{pdf.name}_after_transfer'] = pdf.after_transfer[_time]
+            data[f'{_time}_{pdf.name}_before_transfer'] = sma.results.get('before_transfer', pdf.name, _time)
+            data[f'{_time}_{pdf.name}_after_transfer'] = sma.results.get('after_transfer', pdf.name, _time)
         data[f'{_time}_Snowball_before_transfer'] = (data[f'{_time}_OUT_before_transfer'] +
                                                      data[f'{_time}_DNT_before_transfer'] + data[f'{_time}_KI_before_transfer'])
         data[f'{_time}_Snowball_after_transfer'] = (data[f'{_time}_OUT_after_transfer'] +
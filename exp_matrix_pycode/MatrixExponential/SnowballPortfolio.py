@@ -0,0 +1,245 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+SnowballPortfolio
+--------------------------
+
+Description:
+Pricing of a book of snowball contracts on a process pool.
+
+The contract list (CSV / JSON, or a DataFrame / list of dicts) has one row per contract:
+
+    id, r, vol, t, x0, up, down, out_coupon[, dividend_coupon, notional]
+
+plus optional solver columns (Nx, Nt, integrate_method, is_uniform, is_simplify, is_changed_grid,
+num_eigenvalue, eigen_method, propagator) that override the defaults. Contracts with the same
+operator setup (solver options, r, vol, t, x0, and the barriers on a non-uniform grid) are priced
+together by SnowballBatch.price_scenarios, so identical setups are solved once. Large groups are
+split into tasks of at most `chunk_size` contracts, and the tasks run on a process pool whose
+workers are limited to `blas_threads` BLAS threads each (workers x blas_threads <= cores avoids
+oversubscription).
+
+Results are streamed back as the tasks complete (`iter_portfolio`), progress and throughput are
+logged, and `price_portfolio` writes one consolidated CSV / JSON file in the order of the input.
+When a task fails, its contracts are repriced one by one, so one bad contract only fails its own
+row (`error` column).
+
+    python -m MatrixExponential.SnowballPortfolio book.csv --output prices.csv --workers 4
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+"""
+import os
+import time
+import logging
+import argparse
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # 没有 threadpoolctl 时只通过环境变量限制
+    threadpool_limits = None
+
+CONTRACT_FIELDS = ('r', 'vol', 't', 'x0', 'up', 'down', 'out_coupon')
+SOLVER_DEFAULTS = {'Nx': 200, 'Nt': 330, 'integrate_method': 'inner_product', 'is_uniform': True,
+                   'is_simplify': True, 'is_changed_grid': False, 'num_eigenvalue': None,
+                   'eigen_method': 'general', 'propagator': 'eigen'}
+RESULTS = ('price', 'out_price', 'in_price', 'dnt_price', 'out_proba', 'in_proba', 'dnt_proba')
+BLAS_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+            'NUMEXPR_NUM_THREADS')
+
+logger = logging.getLogger('snowball')
+
+
+def load_contracts(contracts):
+    """ 读取合约列表：CSV / JSON 路径、DataFrame 或 dict 列表 """
+    if isinstance(contracts, pd.DataFrame):
+        df = contracts.copy()
+    elif isinstance(contracts, (str, os.PathLike)):
+        path = os.fspath(contracts)
+        df = pd.read_json(path) if path.lower().endswith('.json') else pd.read_csv(path)
+    else:
+        df = pd.DataFrame(list(contracts))
+    missing = [name for name in CONTRACT_FIELDS if name not in df.columns]
+    if missing:
+        raise ValueError(f"合约列表缺少字段: {missing}")
+    if 'id' not in df.columns:
+        df.insert(0, 'id', np.arange(len(df)))
+    if 'dividend_coupon' not in df.columns:
+        df['dividend_coupon'] = df['out_coupon']
+    df['dividend_coupon'] = df['dividend_coupon'].fillna(df['out_coupon'])
+    df['notional'] = df['notional'].fillna(100) if 'notional' in df.columns else 100
+    return df.reset_index(drop=True)
+
+
+def _solver_options(row, defaults):
+    options = {}
+    for name, default in defaults.items():
+        value = row.get(name, default)
+        options[name] = default if value is None or (isinstance(value, float) and np.isnan(value)) else value
+    options['Nx'], options['Nt'] = int(options['Nx']), int(options['Nt'])
+    if options['num_eigenvalue'] is not None:
+        options['num_eigenvalue'] = int(options['num_eigenvalue'])
+    for name in ('is_uniform', 'is_simplify', 'is_changed_grid'):
+        options[name] = bool(options[name])
+    return options
+
+
+def make_tasks(df, chunk_size=64, **defaults):
+    """ 按算子设置分组（相同设置只求解一次），大组按 chunk_size 拆分 """
+    defaults = {**SOLVER_DEFAULTS, **defaults}
+    groups = {}
+    for i, row in enumerate(df.to_dict('records')):
+        options = _solver_options(row, defaults)
+        key = (tuple(sorted(options.items())), row['r'], row['vol'], row['t'], row['x0'])
+        if not options['is_uniform']:
+            key += (row['up'], row['down'])
+        groups.setdefault(key, (options, []))[1].append(i)
+    tasks = []
+    for options, index in groups.values():
+        for start in range(0, len(index), chunk_size):
+            rows = index[start:start + chunk_size]
+            tasks.append((options, df.iloc[rows][['id', *CONTRACT_FIELDS, 'dividend_coupon', 'notional']]
+                          .to_dict('list'), rows))
+    return tasks
+
+
+def _init_worker(blas_threads):
+    if threadpool_limits is not None:
+        threadpool_limits(blas_threads)
+
+
+def _price(options, contracts):
+    """ 同一算子设置的一组合约，返回每个合约的结果（notional 为 1，外部再乘） """
+    from MatrixExponential.SnowballBatch import price_scenarios
+    first = {name: contracts[name][0] for name in ('r', 't', 'x0')}
+    result = price_scenarios(r=first['r'], vol=contracts['vol'], up=contracts['up'], down=contracts['down'],
+                             out_coupon=contracts['out_coupon'], dividend_coupon=contracts['dividend_coupon'],
+                             notional=1, t=first['t'], x0=first['x0'], **options)
+    return result[list(RESULTS)].to_dict('records')
+
+
+def price_task(task):
+    """ 进程池中执行的任务，失败时逐个合约重新定价，只有出错的合约记录 error """
+    options, contracts, rows = task
+    start_time = time.perf_counter()
+    try:
+        records = _price(options, contracts)
+        errors = [None] * len(rows)
+    except Exception:
+        records, errors = [], []
+        for j in range(len(rows)):
+            single = {name: values[j:j + 1] for name, values in contracts.items()}
+            try:
+                records.append(_price(options, single)[0])
+                errors.append(None)
+            except Exception as e:
+                records.append({name: np.nan for name in RESULTS})
+                errors.append(f'{type(e).__name__}: {e}')
+    elapsed = time.perf_counter() - start_time
+    output = []
+    for j, (record, error) in enumerate(zip(records, errors)):
+        notional = contracts['notional'][j]
+        record = {name: record[name] * notional if name.endswith('price') else record[name] for name in RESULTS}
+        output.append({'row': rows[j], 'id': contracts['id'][j], **record, 'error': error,
+                       'task_time': elapsed, 'task_size': len(rows)})
+    return output
+
+
+@contextmanager
+def blas_environment(blas_threads):
+    """ 子进程启动时读取的 BLAS 线程数环境变量 """
+    saved = {name: os.environ.get(name) for name in BLAS_ENV}
+    os.environ.update({name: str(blas_threads) for name in BLAS_ENV})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def iter_portfolio(contracts, workers=None, blas_threads=1, chunk_size=64, progress=True, **defaults):
+    """ 逐个返回合约的定价结果（按完成顺序） """
+    df = load_contracts(contracts)
+    tasks = make_tasks(df, chunk_size=chunk_size, **defaults)
+    workers = max(1, (os.cpu_count() or 1) // blas_threads) if workers is None else workers
+    total, done, failed = len(df), 0, 0
+    start_time = time.perf_counter()
+    if progress:
+        logger.info(f"{total} 个合约，{len(tasks)} 个任务，{workers} 个进程 x {blas_threads} 个 BLAS 线程")
+
+    def report(records):
+        nonlocal done, failed
+        done += len(records)
+        failed += sum(record['error'] is not None for record in records)
+        if progress:
+            elapsed = time.perf_counter() - start_time
+            logger.info(f"已定价 {done}/{total}，失败 {failed}，{done / elapsed:.1f} 个合约/s")
+
+    if workers <= 1:   # 不启动进程池，便于调试
+        _init_worker(blas_threads)
+        for task in tasks:
+            records = price_task(task)
+            report(records)
+            yield from records
+        return
+    with blas_environment(blas_threads):
+        context = multiprocessing.get_context('spawn')   # 子进程重新导入 numpy，环境变量才会生效
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(blas_threads,)) as executor:
+            futures = {executor.submit(price_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    records = future.result()
+                except Exception as e:  # 进程异常退出等，整组记录为失败
+                    options, contracts, rows = futures[future]
+                    records = [{'row': row, 'id': contracts['id'][j], **{name: np.nan for name in RESULTS},
+                                'error': f'{type(e).__name__}: {e}', 'task_time': np.nan, 'task_size': len(rows)}
+                               for j, row in enumerate(rows)]
+                report(records)
+                yield from records
+
+
+def price_portfolio(contracts, output=None, workers=None, blas_threads=1, chunk_size=64, progress=True,
+                    **defaults):
+    """ 定价整个合约列表，返回（并写入 output, .csv / .json）按输入顺序排列的结果 """
+    df = load_contracts(contracts)
+    start_time = time.perf_counter()
+    records = list(iter_portfolio(df, workers=workers, blas_threads=blas_threads, chunk_size=chunk_size,
+                                  progress=progress, **defaults))
+    elapsed = time.perf_counter() - start_time
+    result = pd.DataFrame(records).sort_values('row').set_index('row')
+    result = pd.concat([df, result.drop(columns='id')], axis=1)
+    if progress:
+        logger.info(f"定价完成：{len(df)} 个合约耗时 {elapsed:.3f}s（{len(df) / elapsed:.1f} 个合约/s）")
+    if output is not None:
+        if os.fspath(output).lower().endswith('.json'):
+            result.to_json(output, orient='records', indent=2)
+        else:
+            result.to_csv(output, index=False)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Portfolio pricing of snowball contracts')
+    parser.add_argument('contracts', help='合约列表 (.csv / .json)')
+    parser.add_argument('--output', default='portfolio_prices.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--blas-threads', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    price_portfolio(args.contracts, output=args.output, workers=args.workers, blas_threads=args.blas_threads,
+                    chunk_size=args.chunk_size)
+    print(f'定价结果已保存到文件: {args.output}')
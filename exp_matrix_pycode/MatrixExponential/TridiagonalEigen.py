@@ -0,0 +1,109 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+TridiagonalEigen
+--------------------------
+
+Description:
+Real eigen decomposition of the tridiagonal Fokker Plank operator built by SnowballDiscrete.
+
+The first and last rows of A only have a diagonal entry (0 for the Fokker Plank operator, -r for
+the backward operator of SnowballBackward), so the boundary nodes only feed the interior block A_int.
+A_int has sub-diagonal s and super-diagonal p with s * p > 0, so the diagonal similarity
+transform D = diag(d), d[i+1] = d[i] * sqrt(s[i] / p[i]) gives the symmetric tridiagonal matrix
+
+    S = D^{-1} A_int D,    S[i, i+1] = S[i+1, i] = sqrt(s[i] * p[i])
+
+which is decomposed by `eigh_tridiagonal`: S = Q diag(w) Q^T with Q orthogonal. The eigenvectors
+of A_int are D Q and their left inverse is Q^T D^{-1}, so the coefficient solve is a matrix-vector
+product. The two modes carried by the boundary nodes are added explicitly so that the full
+spectrum matches `scl.eig(A)`: the eigenvalue of the first node is lambda_0 = A[0, 0] with the
+eigenvector [1, w_0, 0], where (A_int - lambda_0 I) w_0 = -A[1, 0] e_1, and likewise for the last
+node with lambda_N = A[N, N]. A first or last row with an off-diagonal entry (the principal
+sub-matrix of a restricted domain, i.e. an absorbing boundary) is an ordinary interior row.
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Use the real diagonal of the boundary rows for the boundary modes (non-zero for the backward operator);
+      first / last rows with off-diagonal entries are interior rows.
+"""
+import numpy as np
+import scipy.linalg as scl
+
+
+class SymmetricTridiagonalDecomposition:
+
+    def __init__(self, A, number_of_eigenvalue=None):
+        A = A.tocsr()
+        n = A.shape[0]
+        # 只有对角元的首尾行为边界节点；主子矩阵（吸收边界）的首尾行有非对角元，按内部节点处理
+        self.boundary = [i for i, j in ((0, 1), (n - 1, n - 2)) if A[i, j] == 0]
+        lo = 1 if 0 in self.boundary else 0
+        hi = n - 1 if n - 1 in self.boundary else n
+        self.inner = slice(lo, hi)
+        m = hi - lo                                 # 内部节点个数
+        self.diag = A.diagonal()[lo:hi]
+        self.sub = A.diagonal(-1)[lo:hi - 1]        # s[i] = A_int[i+1, i]
+        self.sup = A.diagonal(1)[lo:hi - 1]         # p[i] = A_int[i, i+1]
+        if np.any(self.sub * self.sup <= 0):
+            raise ValueError("算子的次对角线与超对角线乘积非正，无法对称化")
+
+        # 对角相似变换 D，使用对数累加避免溢出
+        log_d = np.concatenate([[0], np.cumsum(0.5 * (np.log(self.sub) - np.log(self.sup)))])
+        self.d = np.exp(log_d - log_d.mean())
+        off = np.sqrt(self.sub * self.sup)
+
+        # 对称三对角特征分解，只保留绝对值最小（最接近 0）的部分特征值
+        nb = len(self.boundary)
+        k = m if number_of_eigenvalue is None else int(min(max(number_of_eigenvalue - nb, 1), m))
+        if k == m:
+            w, Q = scl.eigh_tridiagonal(self.diag, off)
+        else:
+            w, Q = scl.eigh_tridiagonal(self.diag, off, select='i', select_range=(m - k, m - 1))
+        self.Q = Q
+
+        # 边界节点的特征值为该行的对角元：A [1, w0, 0]^T = λ0 [1, w0, 0]^T，A [0, wN, 1]^T = λN [0, wN, 1]^T
+        boundary_values = np.array([A[b, b] for b in self.boundary], dtype=float)
+        banded = np.zeros((3, m))
+        banded[0, 1:] = self.sup
+        banded[2, :-1] = self.sub
+        self.w_boundary = np.zeros((m, nb))
+        for j, (b, value) in enumerate(zip(self.boundary, boundary_values)):
+            row = 0 if b == 0 else m - 1
+            banded[1] = self.diag - value
+            rhs = np.zeros(m)
+            rhs[row] = -A[lo + row, b]
+            self.w_boundary[:, j] = scl.solve_banded((1, 1), banded, rhs)
+
+        self.values = np.concatenate([boundary_values, w])
+        self.vectors = np.zeros((n, k + nb))
+        self.vectors[self.boundary, np.arange(nb)] = 1
+        self.vectors[self.inner, :nb] = self.w_boundary
+        self.vectors[self.inner, nb:] = self.d[:, np.newaxis] * Q
+
+    def solve(self, u):
+        """ 求解特征向量对应的系数，u 可为单个向量 (N,) 或按列堆叠的多个向量 (N, m) """
+        boundary = u[self.boundary]
+        interior = u[self.inner] - self.w_boundary @ boundary
+        if u.ndim == 1:
+            return np.concatenate([boundary, self.Q.T @ (interior / self.d)])
+        return np.vstack([boundary, self.Q.T @ (interior / self.d[:, np.newaxis])])
+
+    def projection_matrix(self):
+        """ 系数投影矩阵 V^+，满足 c = V^+ u，直接由 Q^T D^{-1} 拼接得到，不需要稠密求解 """
+        nb = len(self.boundary)
+        QtD = self.Q.T / self.d
+        projection = np.zeros((self.vectors.shape[1], self.vectors.shape[0]))
+        projection[np.arange(nb), self.boundary] = 1
+        projection[nb:, self.inner] = QtD
+        projection[nb:, self.boundary] = -QtD @ self.w_boundary
+        return projection
+
+    def residual(self, u, coefficient):
+        """ 残差 r = u - V c（保留全部特征值时为 0） """
+        return u - self.vectors @ coefficient
@@ -0,0 +1,569 @@
+# -*- coding:utf-8 -*-
+
+"""
+作者: xta
+日期: 2026年10月18日
+
+SnowballMonteCarlo
+--------------------------
+
+Description:
+Vectorized Monte Carlo pricing of the snowball, with the output of the Electron "mc-path" view
+(static/monte-carlo.json).
+
+The contract follows the conventions of the view (trading days, 21 days per month):
+
+    knock-out: observed on the month ends 21 * m >= start_ob, S / x0 >= barrier_m, where the
+               barrier steps down from start_sd on: barrier_m = up - ((21 * m - start_sd) / 21 + 1) * sd
+    knock-in:  observed every day of `times`, S / x0 < down
+
+and the payoffs are those of Snowball.get_price (discounted with exp(-r T)):
+
+    knock-out at T_m:            notional * out_coupon * T_m
+    knock-in, no knock-out:      notional * min(S_T / x0 - 1, 0)
+    neither:                     notional * dividend_coupon * t
+
+The paths are simulated in chunks of `chunk_size` as (paths x days) arrays of exact GBM log
+increments, the three states are vectorized masks on the chunk, and only the sufficient statistics
+(sum, sum of squares, knock-out counts per date, knock-in count) are kept, so 10^6 paths never
+have to be in memory at once. The first `n_display` paths are kept for the view.
+
+With `method='compact'` (default) only the live paths are carried forward: the days are simulated
+segment by segment between the observed knock-out dates, the paths that knock out are settled at
+once (payoff, discounting, knock-out date) and the survivors, with their log price and knock-in
+flag, are compacted, so the normals of the next segment are only drawn for the survivors. Most
+paths of a 1.03 / 0.85 structure knock out in the first months, which removes most of the work of
+`method='dense'`. Throughput is reported in nominal paths * days per second for both methods.
+The display paths are always simulated in full (dense).
+
+With `sampler='sobol'` the normals come from scrambled Sobol sequences (scipy.stats.qmc) instead
+of the pseudo random generator, one dimension per monitoring day, and the Brownian paths are
+built with a Brownian bridge whose first dimensions are the maturity and then the knock-out
+observation dates (bisection order), the days in between are filled in last, so the low, well
+distributed Sobol coordinates decide the knock-out dates. The paths are split into `replicates`
+independently scrambled sequences of 2^m points each (n_paths is rounded up accordingly); the price
+is the mean of the replicates and the standard error comes from their spread. QMC paths are always
+simulated in full (the bridge needs the maturity first), `method` only applies to `sampler='pseudo'`.
+
+Variance reduction (pseudo random, dense paths):
+
+    antithetic=True          the paths come in pairs (z, -z), the pair means are the samples
+    control_price=P          the constant-vol snowball on the same normals is a control variate with
+                             the known (PDE) price P: price = mean(Y) - beta * (mean(X) - P), with
+                             beta = cov(X, Y) / var(X) estimated on the fly from the sums
+
+Y is the payoff of the priced contract: the snowball itself, or a variant the PDE cannot handle
+(stochastic vol, path-dependent coupons, see SnowballVariants) that overrides `_target_paths` /
+`_target_payoff`. The result reports `variance_reduction` (variance of the plain estimator over
+that of the reported one, same number of paths) and `effective_paths` (plain paths for the same
+standard error). On the snowball itself the control equals the target (beta = 1, stderr = 0), so
+control_price is only accepted by variants. `variance_reduction` only measures the Monte Carlo
+noise: the discretization error of P (about 4e-3 per 100 notional at Nx=1000 against Nx=4000)
+enters the price as beta * error and is not part of stderr. Pass `control_error` (an estimate of
+|P - true price|) to get this bias bound reported as `control_bias`.
+
+Reproducible parallel runs (pseudo random): the paths are split into fixed chunks of `chunk_size`,
+chunk k draws from its own stream SeedSequence(seed).spawn(n_chunks)[k], and the chunks run on a
+process pool of `workers` (None: CPU cores // blas_threads). The per-chunk sufficient statistics
+(sums, sums of squares, knock-out date histograms) are merged in chunk order, so the result is
+bit-identical for every worker count. With `checkpoint=path` every finished chunk is appended to
+a JSON lines file, and a rerun with the same parameters only simulates the missing chunks (with
+seed=None the entropy of the first run is read back). `scaling` reports the speedup and the
+efficiency per worker count.
+
+`times` (in years) replaces the daily trading-day grid, e.g. the tvec of SnowballMatrixApproximation
+to monitor the knock-in on exactly the days of the PDE; the knock-out dates must be part of it.
+
+    mc = SnowballMonteCarlo(r=0.03, vol=0.13, t=1, x0=100, up=1.03, down=0.85, out_coupon=0.2,
+                            notional=100, n_paths=10 ** 6, seed=1)
+    result = mc.run()            # price, stderr, ko_proba, ki_proba, dnt_proba, ...
+    mc.to_json('static/monte-carlo.json')
+
+Version History:
+1.0.0 - 2026-10-18
+    - Codebase implementation.
+1.0.1 - 2026-10-18
+    - Add `method='compact'`: active-set compaction after every knock-out date and the throughput report.
+1.0.2 - 2026-10-18
+    - Add `sampler='sobol'`: scrambled Sobol QMC with Brownian bridge construction and randomized replicates.
+1.0.3 - 2026-10-18
+    - Add antithetic variates, the PDE price control variate and the variance reduction report.
+1.0.4 - 2026-10-18
+    - Run fixed chunks with SeedSequence-spawned streams on a process pool, checkpoint / resume and `scaling`.
+1.0.5 - 2026-10-18
+    - control_price requires a variant; report the bias bound of the control price (`control_error`).
+"""
+import os
+import copy
+import json
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from scipy.special import ndtri
+from scipy.stats import qmc
+from Auxiliary.Runtime import PROFILER
+from MatrixExponential.SnowballPortfolio import blas_environment, _init_worker
+
+DAYS_PER_YEAR = 252
+DAYS_PER_MONTH = 21
+
+# 不影响结果的参数，不参与 checkpoint 的一致性检查
+RUN_FIELDS = ('workers', 'blas_threads', 'checkpoint', 'display', 'result')
+
+logger = logging.getLogger('snowball')
+
+
+def _simulate_task(mc, index, n, seed):
+    """ 进程池中执行的任务 """
+    return index, *mc.simulate_task(index, n, seed)
+
+
+class SnowballMonteCarlo:
+
+    is_variant = False                 # True 时收益不是常数波动率的雪球，不能压缩路径或使用 Brownian bridge
+
+    def __init__(self, r, vol, t, x0, up, down, out_coupon, dividend_coupon=None, notional=1, start_ob=21,
+                 start_sd=None, sd=None, times=None, n_paths=100000, chunk_size=10000, n_display=100, seed=None,
+                 method='compact', sampler='pseudo', replicates=16, antithetic=False, control_price=None,
+                 workers=1, blas_threads=1, checkpoint=None, control_error=None):
+        self.r = r
+        self.vol = vol
+        self.t = t
+        self.x0 = x0
+        self.up = up                   # 敲出价格（相对 x0）
+        self.down = down               # 敲入价格（相对 x0）
+        self.out_coupon = out_coupon
+        self.dividend_coupon = out_coupon if dividend_coupon is None else dividend_coupon
+        self.notional = notional
+        self.start_ob = start_ob       # 开始观察敲出的交易日
+        self.start_sd = start_sd       # 开始降敲的交易日，None 表示不降敲
+        self.sd = 0.0 if sd is None else sd   # 每月降敲幅度
+        self.n_paths = n_paths
+        self.chunk_size = chunk_size
+        self.n_display = n_display
+        self.seed = seed
+        if method not in ('compact', 'dense'):
+            raise ValueError(f"Unknown method: {method}")
+        self.method = method           # 'compact': 只演化未敲出的路径, 'dense': 完整的 (路径 x 天数) 数组
+        if sampler not in ('pseudo', 'sobol'):
+            raise ValueError(f"Unknown sampler: {sampler}")
+        self.sampler = sampler         # 'pseudo': 伪随机数, 'sobol': 加扰 Sobol 序列 + Brownian bridge
+        self.replicates = replicates   # sobol 时独立加扰的序列个数，用于估计标准误差
+        self.antithetic = antithetic   # 对偶变量
+        self.control_price = control_price   # 常数波动率雪球的已知价格（与 price 同单位），作为控制变量
+        self.control_error = control_error   # control_price 的离散误差估计（与 price 同单位），None 时不报告
+        if control_price is not None and not self.is_variant:
+            raise ValueError("control_price 只能用于变体合约：雪球本身与控制变量相同，估计值恒等于 control_price")
+        self.workers = workers         # 进程数，None 时按 CPU 核数决定，<= 1 时串行
+        self.blas_threads = blas_threads
+        self.checkpoint = checkpoint   # 已完成 chunk 的 JSON lines 文件，None 时不保存
+        if sampler == 'sobol' and (antithetic or control_price is not None or self.is_variant):
+            raise ValueError("sobol 不支持对偶变量、控制变量与变体合约")
+        if antithetic or control_price is not None or self.is_variant:
+            self.method = 'dense'      # 需要每条路径完整的正态样本
+        if antithetic:                 # 成对的路径不能被 chunk 拆开
+            self.n_paths, self.chunk_size, self.n_display = (value + value % 2 for value in
+                                                             (n_paths, chunk_size, n_display))
+
+        # 敲出观察日（每月末）与障碍价格
+        days = int(round(self.t * DAYS_PER_YEAR))
+        self.ko_day = np.arange(DAYS_PER_MONTH, days + 1, DAYS_PER_MONTH)
+        self.ko_time = self.ko_day / DAYS_PER_YEAR
+        self.ko_observed = self.ko_day >= self.start_ob
+        self.ko_barrier = np.full(self.ko_day.shape, float(self.up))
+        if self.start_sd is not None:
+            step_down = self.ko_day >= self.start_sd
+            self.ko_barrier[step_down] -= ((self.ko_day[step_down] - self.start_sd) / DAYS_PER_MONTH + 1) * self.sd
+        # 敲入观察日，默认为每个交易日
+        self.times = np.arange(1, days + 1) / DAYS_PER_YEAR if times is None else np.asarray(times, dtype=float)
+        self.ko_idx = np.searchsorted(self.times, self.ko_time - 1e-12)
+        if np.any(self.ko_idx >= self.times.shape[0]) or not np.allclose(self.times[self.ko_idx], self.ko_time):
+            raise ValueError("times 必须包含全部敲出观察日")
+        self.dt = np.diff(self.times, prepend=0)
+        self.drift = (self.r - 0.5 * self.vol ** 2) * self.dt
+        self.diffusion = self.vol * np.sqrt(self.dt)
+        # 压缩活跃路径的分段：每段止于一个观察的敲出日（最后一段止于到期日）
+        self.segments = [(i, self.ko_idx[i] + 1) for i in np.flatnonzero(self.ko_observed)]
+        if not self.segments or self.segments[-1][1] < self.times.shape[0]:
+            self.segments.append((None, self.times.shape[0]))
+        self.bridge = bridge_order(self.times, self.ko_idx[self.ko_observed])
+        # 各种结局的贴现收益（单位名义本金）
+        self.ko_payoff = self.out_coupon * self.ko_time * np.exp(-self.r * self.ko_time)
+        self.discount = np.exp(-self.r * self.times[-1])
+        self.dnt_payoff = self.dividend_coupon * self.t * self.discount
+
+        self.display = None            # 展示的路径 (n_display, days)，S / x0
+        self.result = None
+
+    def _log_increments(self, rng, n, days=slice(None)):
+        """ (n, days) 的 GBM 对数增量 """
+        drift, diffusion = self.drift[days], self.diffusion[days]
+        return drift + diffusion * rng.standard_normal((n, drift.shape[0]))
+
+    def _normals(self, rng, n, days):
+        """ (n, days) 的标准正态样本，antithetic 时后一半为前一半的相反数 """
+        if not self.antithetic:
+            return rng.standard_normal((n, days))
+        z = rng.standard_normal((n // 2, days))
+        return np.concatenate((z, -z))
+
+    def _bridge_paths(self, z):
+        """ 由按 bridge 顺序排列的正态样本 (n, days) 构造 Brownian bridge，返回路径 (n, days)（S / x0） """
+        z = np.ascontiguousarray(z.T)     # 按行（日期）访问
+        w = np.zeros(z.shape)
+        for k, (i, left, right, a, b, sigma) in enumerate(self.bridge):
+            w[i] = sigma * z[k]
+            if left >= 0:
+                w[i] += a * w[left]
+            if right is not None:
+                w[i] += b * w[right]
+        w *= self.vol
+        w += ((self.r - 0.5 * self.vol ** 2) * self.times)[:, np.newaxis]
+        return np.exp(w, out=w).T
+
+    def simulate_sobol(self, engine, n, stats):
+        """ 由 Sobol 序列 engine 的后续 n 个点模拟完整路径并累加到 stats，返回路径 (S / x0) """
+        u = np.clip(engine.random(n), 1e-16, 1 - 1e-16)
+        paths = self._bridge_paths(ndtri(u, out=u))
+        self._accumulate(stats, *self._payoff(paths))
+        stats['simulated_days'] += paths.size
+        return paths
+
+    def _target_paths(self, rng, z, paths):
+        """ 被定价合约的路径 (S / x0)，默认即由 z 生成的常数波动率路径 paths；随机波动率等变体覆盖此方法 """
+        return paths
+
+    def _target_payoff(self, paths):
+        """ 被定价合约的收益，默认即雪球本身；路径依赖票息等变体覆盖此方法 """
+        return self._payoff(paths)
+
+    def _payoff(self, paths):
+        """ 一组路径 (n, days)（S / x0）的贴现收益与敲出日期（未敲出为 -1）、是否敲入 """
+        hit = (paths[:, self.ko_idx] >= self.ko_barrier) & self.ko_observed
+        knocked_out = hit.any(axis=1)
+        ko_date = np.where(knocked_out, hit.argmax(axis=1), -1)
+        knocked_in = (paths < self.down).any(axis=1)
+        payoff = np.where(knocked_in, np.minimum(paths[:, -1] - 1, 0) * self.discount, self.dnt_payoff)
+        payoff[knocked_out] = self.ko_payoff[ko_date[knocked_out]]
+        return payoff, ko_date, knocked_in & ~knocked_out
+
+    def new_stats(self):
+        """ 充分统计量，各 chunk 的统计量直接相加即可合并 """
+        return {'n': 0, 'samples': 0, 'sum': 0.0, 'sumsq': 0.0, 'path_sumsq': 0.0, 'control_sum': 0.0,
+                'control_sumsq': 0.0, 'cross_sum': 0.0, 'ko_counts': np.zeros(self.ko_day.shape[0], dtype=np.int64),
+                'ki_count': 0, 'simulated_days': 0}
+
+    def _accumulate(self, stats, payoff, ko_date, knocked_in, control=None):
+        """ n、path_sumsq 与各状态按路径累加；samples、sum、sumsq 与控制变量按独立样本（对偶时为成对均值）累加 """
+        stats['n'] += payoff.shape[0]
+        stats['path_sumsq'] += payoff @ payoff
+        stats['ko_counts'] += np.bincount(ko_date[ko_date >= 0], minlength=self.ko_day.shape[0])
+        stats['ki_count'] += int(knocked_in.sum())
+        if self.antithetic:
+            half = payoff.shape[0] // 2
+            payoff = (payoff[:half] + payoff[half:]) / 2
+            control = None if control is None else (control[:half] + control[half:]) / 2
+        stats['samples'] += payoff.shape[0]
+        stats['sum'] += payoff.sum()
+        stats['sumsq'] += payoff @ payoff
+        if control is not None:
+            stats['control_sum'] += control.sum()
+            stats['control_sumsq'] += control @ control
+            stats['cross_sum'] += control @ payoff
+
+    def simulate_dense(self, rng, n, stats):
+        """ 模拟 n 条完整路径并累加到 stats，返回该 chunk 的路径 (S / x0) """
+        z = self._normals(rng, n, self.times.shape[0])
+        control = np.exp(np.cumsum(self.drift + self.diffusion * z, axis=1))
+        paths = self._target_paths(rng, z, control)
+        self._accumulate(stats, *self._target_payoff(paths),
+                         control=None if self.control_price is None else self._payoff(control)[0])
+        stats['simulated_days'] += paths.size
+        return paths
+
+    def simulate_compact(self, rng, n, stats):
+        """ 模拟 n 条路径并累加到 stats，每个敲出观察日之后只保留未敲出的路径 """
+        log_down = np.log(self.down)
+        log_barrier = np.log(self.ko_barrier)
+        x = np.zeros(n)                   # 活跃路径当前的 log(S / x0)
+        knocked_in = np.zeros(n, dtype=bool)
+        settled = []                      # 已敲出路径的 (收益, 敲出日期)
+        start = 0
+        for date, stop in self.segments:
+            if x.shape[0] == 0:
+                break
+            path = x[:, np.newaxis] + np.cumsum(self._log_increments(rng, x.shape[0], slice(start, stop)), axis=1)
+            stats['simulated_days'] += path.size
+            knocked_in |= (path < log_down).any(axis=1)
+            x = path[:, -1]
+            start = stop
+            if date is None:
+                continue
+            # 敲出的路径立即结算，其余路径压缩
+            out = x >= log_barrier[date]
+            count = int(out.sum())
+            settled.append((np.full(count, self.ko_payoff[date]), np.full(count, date)))
+            x, knocked_in = x[~out], knocked_in[~out]
+        # 到期未敲出的路径
+        payoff = np.where(knocked_in, np.minimum(np.exp(x) - 1, 0) * self.discount, self.dnt_payoff)
+        settled.append((payoff, np.full(x.shape[0], -1)))
+        payoff, ko_date = (np.concatenate(value) for value in zip(*settled))
+        self._accumulate(stats, payoff, ko_date, np.concatenate((np.zeros(n - x.shape[0], dtype=bool), knocked_in)))
+
+    def simulate_chunk(self, rng, n, stats):
+        """ 按 method 模拟 n 条路径并累加到 stats """
+        if self.method == 'compact':
+            self.simulate_compact(rng, n, stats)
+        else:
+            self.simulate_dense(rng, n, stats)
+
+    def merge_stats(self, chunk_stats):
+        """ 按给定顺序合并各 chunk 的统计量（顺序固定时结果逐位相同） """
+        stats = self.new_stats()
+        for item in chunk_stats:
+            for name in stats:
+                stats[name] += item[name]
+        return stats
+
+    def summarize(self, stats, elapsed=None, stderr=None):
+        """ 由充分统计量得到价格与标准误差（按 notional 缩放）及各状态的概率，stderr 给定时（单位名义本金）不再由
+            样本方差估计 """
+        n, samples = stats['n'], stats['samples']
+        mean, variance = _moments(stats['sum'], stats['sumsq'], samples)
+        ko_counts = stats['ko_counts']
+        result = {'n_paths': n, 'ko_proba': ko_counts.sum() / n, 'ki_proba': stats['ki_count'] / n,
+                  'dnt_proba': 1 - (ko_counts.sum() + stats['ki_count']) / n,
+                  'ko_counts': ko_counts.tolist(), 'ko_day': self.ko_day.tolist(),
+                  'ko_barrier': self.ko_barrier.tolist()}
+        if self.control_price is not None:
+            # 控制变量：beta 由样本协方差估计，方差为回归残差的方差
+            control_mean, control_variance = _moments(stats['control_sum'], stats['control_sumsq'], samples)
+            covariance = (stats['cross_sum'] - samples * mean * control_mean) / max(samples - 1, 1)
+            beta = covariance / control_variance if control_variance > 0 else 0.0
+            correlation = covariance / np.sqrt(control_variance * variance) if control_variance * variance > 0 else 0.0
+            mean -= beta * (control_mean - self.control_price / self.notional)
+            variance = max(variance - beta * covariance, 0)
+            result.update(beta=beta, correlation=correlation, control_mc_price=control_mean * self.notional)
+            if self.control_error is not None:   # 控制变量价格的离散误差按 beta 进入价格，不包含在 stderr 中
+                result['control_bias'] = abs(beta) * self.control_error
+        stderr = np.sqrt(variance / samples) if stderr is None else stderr
+        # 与相同路径数的普通蒙特卡洛相比的方差缩减倍数
+        _, path_variance = _moments(stats['sum'] * n / samples, stats['path_sumsq'], n)
+        reduction = path_variance / n / stderr ** 2 if stderr != 0 else np.inf
+        result.update(price=mean * self.notional, stderr=stderr * self.notional, variance_reduction=reduction,
+                      effective_paths=n * reduction)
+        path_days = n * self.times.shape[0]
+        result['simulated_fraction'] = stats['simulated_days'] / path_days   # 实际模拟的 路径 x 天数 占比
+        if elapsed is not None:
+            result['elapsed'] = elapsed
+            result['throughput'] = path_days / elapsed                         # 路径 x 天数 / s
+        return result
+
+    def tasks(self):
+        """ 固定大小的 chunk [(编号, 路径数)]，与进程数无关 """
+        return [(index, min(self.chunk_size, self.n_paths - start))
+                for index, start in enumerate(range(0, self.n_paths, self.chunk_size))]
+
+    def simulate_task(self, index, n, seed):
+        """ 第 index 个 chunk：由独立的随机数流 seed 模拟 n 条路径，返回统计量与展示的路径（仅第 0 个 chunk） """
+        rng = np.random.default_rng(seed)
+        stats = self.new_stats()
+        display = None
+        if index == 0:
+            # 展示的路径需要完整的价格序列，作为前 n_display 条路径完整模拟（同样计入统计量）
+            n_display = min(self.n_display, n)
+            display = self.simulate_dense(rng, n_display, stats)
+            n -= n_display
+        if n:
+            self.simulate_chunk(rng, n, stats)
+        return stats, display
+
+    def run(self):
+        """ 按 chunk 模拟 n_paths 条路径，返回定价结果 """
+        if self.sampler == 'sobol':
+            return self._run_sobol()
+        start_time = time.perf_counter()
+        tasks = self.tasks()
+        finished, entropy = self._read_checkpoint()
+        seeds = np.random.SeedSequence(entropy).spawn(len(tasks))
+        todo = [(index, n, seeds[index]) for index, n in tasks if index not in finished]
+        with PROFILER.phase('simulation'):
+            for index, stats, display in self._map(todo):
+                finished[index] = stats
+                if display is not None:
+                    self.display = display
+                self._write_checkpoint(entropy, index, stats, display)
+        stats = self.merge_stats(finished[index] for index, _ in tasks)
+        self.result = self.summarize(stats, time.perf_counter() - start_time)
+        self.result.update(entropy=entropy, chunks=len(tasks), resumed_chunks=len(tasks) - len(todo))
+        return self.result
+
+    def _map(self, todo):
+        """ 逐个返回 (编号, 统计量, 展示的路径)，进程池时按完成顺序 """
+        cores = max(1, (os.cpu_count() or 1) // self.blas_threads)
+        workers = min(cores if self.workers is None else self.workers, len(todo))
+        logger.info(f"{len(todo)} 个 chunk，{max(workers, 1)} 个进程 x {self.blas_threads} 个 BLAS 线程")
+        if workers <= 1:   # 不启动进程池，便于调试
+            for task in todo:
+                yield _simulate_task(self, *task)
+            return
+        with blas_environment(self.blas_threads):
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(self.blas_threads,)) as executor:
+                futures = [executor.submit(_simulate_task, self, *task) for task in todo]
+                for future in as_completed(futures):
+                    yield future.result()
+
+    def run_key(self):
+        """ 决定结果的参数，checkpoint 只能由参数相同的运行续算 """
+        key = {'class': type(self).__name__, 'times': self.times.tolist()}
+        key.update({name: value for name, value in vars(self).items() if name not in RUN_FIELDS and
+                    (value is None or isinstance(value, (bool, int, float, str)))})
+        return key
+
+    def _read_checkpoint(self):
+        """ 已完成的 chunk {编号: 统计量} 与随机数流的 entropy，末尾写了一半的行被截去 """
+        entropy = np.random.SeedSequence(self.seed).entropy
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return {}, entropy
+        finished = {}
+        with open(self.checkpoint, 'rb+') as f:
+            header = json.loads(f.readline())
+            if header['key'] != json.loads(json.dumps(self.run_key())):
+                raise ValueError(f"checkpoint {self.checkpoint} 与当前参数不一致")
+            valid = f.tell()
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                stats = record['stats']
+                stats['ko_counts'] = np.array(stats['ko_counts'], dtype=np.int64)
+                finished[record['index']] = stats
+                if record.get('display') is not None:
+                    self.display = np.array(record['display'])
+                valid += len(line)
+            f.truncate(valid)
+        logger.info(f"由 {self.checkpoint} 续算，已完成 {len(finished)} 个 chunk")
+        return finished, header['entropy']
+
+    def _write_checkpoint(self, entropy, index, stats, display):
+        if self.checkpoint is None:
+            return
+        new = not os.path.exists(self.checkpoint)
+        with open(self.checkpoint, 'a') as f:
+            if new:
+                f.write(json.dumps({'key': self.run_key(), 'entropy': entropy}) + '\n')
+            stats = {name: value.tolist() if isinstance(value, np.ndarray) else value for name, value in stats.items()}
+            f.write(json.dumps({'index': index, 'stats': stats,
+                                'display': None if display is None else display.tolist()}) + '\n')
+
+    def scaling(self, workers=(1, 2, 4)):
+        """ 各进程数的耗时、加速比与并行效率 T_1 / (p T_p)，并检查结果是否逐位相同 """
+        records = []
+        for count in workers:
+            mc = copy.copy(self)
+            mc.workers, mc.checkpoint = count, None
+            result = mc.run()
+            records.append({'workers': count, 'elapsed': result['elapsed'], 'price': result['price'],
+                            'stderr': result['stderr'], 'ko_counts': result['ko_counts']})
+        base = records[0]
+        for record in records:
+            record['speedup'] = base['elapsed'] / record['elapsed']
+            record['efficiency'] = record['speedup'] * base['workers'] / record['workers']
+            record['identical'] = all(record[name] == base[name] for name in ('price', 'stderr', 'ko_counts'))
+        return records
+
+    def _run_sobol(self):
+        """ replicates 个独立加扰的 Sobol 序列，价格为各序列均值的平均，标准误差由其离散程度估计 """
+        start_time = time.perf_counter()
+        m = int(np.ceil(np.log2(max(self.n_paths / self.replicates, 1))))
+        chunk = 2 ** min(m, int(np.log2(max(self.chunk_size, 1))))   # 每次取 2 的幂个点，保持 Sobol 的均衡性
+        seeds = np.random.SeedSequence(self.seed).spawn(self.replicates)
+        stats = self.new_stats()
+        self.display = None
+        means = []
+        with PROFILER.phase('simulation'):
+            for seed in seeds:
+                engine = qmc.Sobol(self.times.shape[0], scramble=True, seed=np.random.default_rng(seed))
+                replicate = self.new_stats()
+                for _ in range(2 ** m // chunk):
+                    paths = self.simulate_sobol(engine, chunk, replicate)
+                    if self.display is None:
+                        self.display = paths[:self.n_display].copy()
+                means.append(replicate['sum'] / replicate['n'])
+                stats = self.merge_stats((stats, replicate))
+        stderr = np.std(means, ddof=1) / np.sqrt(len(means)) if len(means) > 1 else np.nan
+        result = self.summarize(stats, time.perf_counter() - start_time, stderr=stderr)
+        result['replicates'] = len(means)
+        self.result = result
+        return self.result
+
+    def parameter(self):
+        """ monte-carlo.json 中的 parameter（不降敲时降敲起始日为最后一个观察日，幅度为 0） """
+        return {'kiInput': self.down, 'koInput': self.up, 'start_obInput': int(self.start_ob),
+                'start_sdInput': int(self.ko_day[-1] if self.start_sd is None else self.start_sd),
+                'sdInput': self.sd}
+
+    def to_json(self, path=None):
+        """ 返回（并写入 path）与 static/monte-carlo.json 相同结构的 {parameter, path} """
+        if self.display is None:
+            self.run()
+        data = {'parameter': self.parameter(), 'path': self.display.tolist()}
+        if path is not None:
+            with open(path, 'w') as json_file:
+                json.dump(data, json_file, indent=4)
+        return data
+
+
+def _moments(total, total_sq, n):
+    """ 由和与平方和得到均值与（无偏）方差 """
+    mean = total / n
+    return mean, max(total_sq / n - mean ** 2, 0) * n / max(n - 1, 1)
+
+
+def bridge_order(times, anchors):
+    """ Brownian bridge 的构造顺序：先到期日，再按二分顺序构造 anchors（敲出观察日的下标），最后按二分顺序
+        （逐层）填充其余的日期。返回 [(i, left, right, a, b, sigma)]：
+        W_i = a * W_left + b * W_right + sigma * z，left = -1 表示 0 时刻（W = 0），right = None 表示无右端点 """
+    times = np.asarray(times, dtype=float)
+    last = times.shape[0] - 1
+    order = [(last, -1, None, 0.0, 0.0, np.sqrt(times[last]))]
+    done = {last}
+    for candidates in (anchors, range(last)):
+        remaining = sorted(set(int(i) for i in candidates) - done)
+        built = sorted(done | {-1})
+        intervals = list(zip(built[:-1], built[1:]))
+        while remaining:
+            next_intervals = []
+            for left, right in intervals:
+                inside = [i for i in remaining if left < i < right]
+                if not inside:
+                    continue
+                i = inside[(len(inside) - 1) // 2]
+                t_left = 0.0 if left < 0 else times[left]
+                span = times[right] - t_left
+                a = (times[right] - times[i]) / span
+                b = (times[i] - t_left) / span
+                order.append((i, left, right, a, b, np.sqrt((times[i] - t_left) * (times[right] - times[i]) / span)))
+                done.add(i)
+                next_intervals += [(left, i), (i, right)]
+            remaining = [i for i in remaining if i not in done]
+            intervals = next_intervals
+    return order
+
+
+if __name__ == '__main__':
+    mc = SnowballMonteCarlo(r=0.03, vol=0.13, t=1, x0=100, up=1.03, down=0.8, out_coupon=0.2, notional=100,
+                            start_ob=63, start_sd=84, sd=0.03, n_paths=10 ** 6, seed=2026)
+    result = mc.run()
+    print(f"价格: {result['price']:.4f} ± {result['stderr']:.4f}（{result['n_paths']} 条路径，"
+          f"{result['elapsed']:.2f}s）")
+    print(f"敲出概率: {result['ko_proba']:.4f}, 敲入概率: {result['ki_proba']:.4f}, "
+          f"未敲入未敲出概率: {result['dnt_proba']:.4f}")
+    print(f"吞吐量: {result['throughput']:.3e} 路径·天/s（实际模拟 {result['simulated_fraction']:.1%}）")
+    mc.to_json('monte-carlo.json')
+    print('路径已保存到文件: monte-carlo.json')